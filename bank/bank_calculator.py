@@ -1,68 +1,331 @@
+import argparse
 import os
-from decimal import Decimal
-
-import pandas as pd
-from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
 
 from bank.bnp.bnp_hello_statement_extractor import BNPHelloStatementExtractor
 from bank.bnp.bnp_statement_extractor import BNPStatementExtractor
+from bank.generic import pdf_page_analysis
 from bank.generic.bank_statement_extractor import BankStatementExtractor
+from bank.generic.extractor_registry import ExtractorRegistry
 from bank.generic.transaction_categorizer import TransactionCategorizer
-from bank.model.transaction import BankStatement
+from bank.model.transaction_category import TransactionCategory
+from bank.model.transaction_table import TransactionTable
+from bank.report import transaction_dataset
 from bank.revolut.revolut_statement_extractor import RevolutStatementExtractor
 from bank.sg.sg_statement_extractor import SGStatementExtractor
-from const.const_gl import ConstGl
-from util import os_util
+from const.const_gl import ConstGl, setup_dirs
+from util import os_util, run_manifest, tracing
 from util.result_file_cache import ResultFileCache
 
 
-def extract_transactions(directory: str,
-                         extractor: BankStatementExtractor,
-                         result_cache: ResultFileCache) -> list:
+def load_statement_transactions(doc_path: str,
+                                extractor: BankStatementExtractor,
+                                result_cache: ResultFileCache) -> TransactionTable:
+    """Transactions of a statement, loaded from the cache without building models, or extracted and cached."""
+    file_hash = result_cache.compute_hash(doc_path)
+    statement_json = result_cache.get_document_json_by_hash(file_hash)
+    if statement_json is None:
+        print(f"Processing and caching {doc_path}")
+        bank_statement = extractor.extract_and_validate(doc_path)
+        result_cache.update_hash_map(doc_path, bank_statement, file_hash)
+        return bank_statement.transaction_table
+    with tracing.span("load_cached_statement", document=doc_path):
+        return TransactionTable.from_statement_json(statement_json, doc_path)
+
+def list_statements(directory: str,
+                    extractor: BankStatementExtractor,
+                    only_documents: Optional[set[str]] = None) -> list[str]:
+    """
+    Paths of the statements of a bank directory, in name order, restricted to only_documents when given.
+    Files the extractor doesn't read (other file types, or unrecognized files of the inbox) are skipped.
+    """
     if not os.path.exists(directory):
         return []
-    doc_statements = os.listdir(directory)
-    all_transactions = []
-    for doc_statement in tqdm(doc_statements, desc="Processing statements from " + directory):
-        doc_path = os.path.join(directory, doc_statement)
-        bank_statement = result_cache.get_or_process_document(doc_path, extractor.extract_and_validate)
-        all_transactions.extend(bank_statement.transactions)
+    doc_paths = [os.path.join(directory, doc_statement) for doc_statement in sorted(os.listdir(directory))]
+    doc_paths = [doc_path for doc_path in doc_paths
+                 if os.path.isfile(doc_path) and extractor.is_statement_file(doc_path)]
+    if only_documents is not None:
+        doc_paths = [doc_path for doc_path in doc_paths if doc_path in only_documents]
+    return doc_paths
+
+def extract_transactions(directory: str,
+                         extractor: BankStatementExtractor,
+                         result_cache: ResultFileCache,
+                         only_documents: Optional[set[str]] = None) -> TransactionTable:
+    from tqdm import tqdm
+
+    all_transactions = TransactionTable()
+    for doc_path in tqdm(list_statements(directory, extractor, only_documents),
+                         desc="Processing statements from " + directory):
+        all_transactions.extend(load_statement_transactions(doc_path, extractor, result_cache))
     return all_transactions
 
-def main():
-    print("main")
-    result_hasher = ResultFileCache()
-    all_transactions = []
-    banks_path_tuples = [
-        (ConstGl.PATH_TO_BANK_DATA_BNP, BNPStatementExtractor()),
-        (ConstGl.PATH_TO_BANK_DATA_HELLO_BANK, BNPHelloStatementExtractor()),
-        (ConstGl.PATH_TO_BANK_DATA_REVOLUT, RevolutStatementExtractor()),
-        (ConstGl.PATH_TO_BANK_DATA_SG, SGStatementExtractor()),
+def extract_transactions_parallel(banks_path_tuples: list[tuple[str, BankStatementExtractor]],
+                                  result_cache: ResultFileCache,
+                                  jobs: int,
+                                  only_documents: Optional[set[str]] = None) -> TransactionTable:
+    """
+    Same result as calling extract_transactions for each bank in order, but the statements
+    missing from the cache, from all banks, are extracted by a pool of `jobs` processes.
+    Extracted statements are written back to the cache from the main process.
+    """
+    from tqdm import tqdm
+
+    # look up the cache first so that every cache miss of every bank is submitted at once
+    bank_documents = []
+    for directory, extractor in banks_path_tuples:
+        documents = []
+        for doc_path in list_statements(directory, extractor, only_documents):
+            file_hash = result_cache.compute_hash(doc_path)
+            statement_json = result_cache.get_document_json_by_hash(file_hash)
+            documents.append((doc_path, file_hash, statement_json))
+        bank_documents.append((directory, extractor, documents))
+
+    all_transactions = TransactionTable()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for _, extractor, documents in bank_documents:
+            for doc_path, _, statement_json in documents:
+                if statement_json is None and tracing.is_enabled():
+                    # spans of the worker processes are sent back with the statements
+                    futures[doc_path] = executor.submit(tracing.run_collecting_events,
+                                                        extractor.extract_and_validate, doc_path)
+                elif statement_json is None:
+                    futures[doc_path] = executor.submit(extractor.extract_and_validate, doc_path)
+
+        for directory, _, documents in bank_documents:
+            for doc_path, file_hash, statement_json in tqdm(documents, desc="Processing statements from " + directory):
+                if statement_json is None:
+                    print(f"Processing and caching {doc_path}")
+                    bank_statement = futures[doc_path].result()
+                    if tracing.is_enabled():
+                        bank_statement, events = bank_statement
+                        tracing.add_events(events)
+                    result_cache.update_hash_map(doc_path, bank_statement, file_hash)
+                    all_transactions.extend(bank_statement.transaction_table)
+                else:
+                    all_transactions.extend(TransactionTable.from_statement_json(statement_json, doc_path))
+    return all_transactions
+
+def categorize_transactions(transactions: TransactionTable,
+                            transaction_categorizer: TransactionCategorizer,
+                            interactive: bool = True) -> list[int]:
+    """
+    Categorize the transactions of the table in place, asking the user when needed.
+    When not interactive (e.g. in the watch daemon), transactions without a matching rule are left
+    MISCELLANEOUS_OTHER and reported.
+
+    :return: positions of the transactions left without the category decision of the user, when not interactive
+    """
+    import numpy as np
+    from tqdm import tqdm
+
+    # the frame is only used by the batch rule search
+    df = transactions.to_frame()
+    with tracing.span("categorize_frame", rows=len(df)):
+        need_user_mask = transaction_categorizer.categorize_frame(df, 50000)
+    transactions.transaction_category = df['transaction_category'].tolist()
+    del df
+    need_user_positions = np.flatnonzero(need_user_mask.to_numpy())
+    if not interactive:
+        report_uncategorized_transactions(transactions, need_user_positions)
+        return need_user_positions.tolist()
+    # models are only built for the transactions that may need a user decision
+    need_user_transactions = transactions.to_transactions(need_user_positions)
+    try:
+        # only transactions without a matching rule are left, a user answer may categorize the next ones
+        for position, transaction in tqdm(zip(need_user_positions, need_user_transactions),
+                                          total=len(need_user_positions), desc="Categorizing transactions"):
+            with tracing.span("categorize_transaction", document=transaction.proof_document):
+                is_need_categorization = transaction_categorizer.is_need_categorization(transaction, 50000)
+                transaction_categorizer.categorize(transaction, is_need_categorization)
+            transactions.transaction_category[position] = transaction.transaction_category
+        if len(need_user_positions):
+            recategorize_transactions(transactions, transaction_categorizer)
+    finally:
+        transaction_categorizer.compact_journal()
+    print(f"Category search cache: {transaction_categorizer.search_cache_info()}")
+    return []
+
+def recategorize_transactions(transactions: TransactionTable, transaction_categorizer: TransactionCategorizer):
+    """
+    Search again the category of the transactions left MISCELLANEOUS_OTHER, e.g. with the rules the user just added:
+    the rows that were not asked about (below the amount to ask) are categorized by them too.
+    """
+    positions = [position for position, category in enumerate(transactions.transaction_category)
+                 if category is TransactionCategory.MISCELLANEOUS_OTHER]
+    with tracing.span("recategorize_frame", rows=len(positions)):
+        df = transactions.take(positions).to_frame()
+        # the rows of ignored transactions are left unchanged
+        transaction_categorizer.categorize_frame(df)
+    for position, category in zip(positions, df['transaction_category']):
+        transactions.transaction_category[position] = category
+
+def report_uncategorized_transactions(transactions: TransactionTable, positions: Iterable[int]):
+    """Print the transactions left without a category, to be categorized by an interactive run."""
+    positions = list(positions)
+    if not positions:
+        return
+    print(f"{len(positions)} transactions need a category, run `python bank/bank_calculator.py` "
+          f"to categorize them:")
+    for position in positions:
+        print(f"    {transactions.transaction_date[position]:%Y-%m-%d} {transactions.bank_nomination[position]} "
+              f"-{transactions.expense_amount[position]} +{transactions.income_amount[position]} "
+              f"{transactions.description[position]} ({transactions.proof_document[position]})")
+
+def sort_transactions(transactions: TransactionTable) -> TransactionTable:
+    """
+    Rows of the outputs in a deterministic order, whatever the order statements were listed or added in:
+    by date, bank and statement. The sort is stable, rows of a statement keep their statement order.
+    """
+    dates, banks, documents = transactions.transaction_date, transactions.bank_nomination, transactions.proof_document
+    return transactions.take(sorted(range(len(transactions)),
+                                    key=lambda position: (dates[position], banks[position], documents[position])))
+
+def compute_run_manifest(banks_path_tuples: list[tuple[str, BankStatementExtractor]],
+                         result_cache: ResultFileCache) -> dict[str, str]:
+    """
+    Content hash of every statement, unchanged files are not read thanks to the cache file hash index.
+    A statement found several times (e.g. in its bank directory and in the inbox) is only kept at its first path,
+    in the order of the bank directories, so that its transactions are not added twice.
+    """
+    manifest = {}
+    first_paths = {}
+    for directory, extractor in banks_path_tuples:
+        for doc_path in list_statements(directory, extractor):
+            file_hash = result_cache.compute_hash(doc_path)
+            if file_hash in first_paths:
+                print(f"Skipping {doc_path}, same statement as {first_paths[file_hash]}")
+                continue
+            first_paths[file_hash] = doc_path
+            manifest[doc_path] = file_hash
+    return manifest
+
+def get_banks_path_tuples(page_jobs: int = 1,
+                          backend: str = pdf_page_analysis.PDFPLUMBER_BACKEND,
+                          result_cache: Optional[ResultFileCache] = None) -> list[tuple[str, BankStatementExtractor]]:
+    """:param result_cache: where the routes of the inbox files are kept, they are sniffed on every run without it"""
+    bnp_extractor = BNPStatementExtractor(page_jobs, backend)
+    hello_bank_extractor = BNPHelloStatementExtractor(page_jobs, backend)
+    revolut_extractor = RevolutStatementExtractor()
+    sg_extractor = SGStatementExtractor(page_jobs, backend)
+    return [
+        (ConstGl.PATH_TO_BANK_DATA_BNP, bnp_extractor),
+        (ConstGl.PATH_TO_BANK_DATA_HELLO_BANK, hello_bank_extractor),
+        (ConstGl.PATH_TO_BANK_DATA_REVOLUT, revolut_extractor),
+        (ConstGl.PATH_TO_BANK_DATA_SG, sg_extractor),
+        # unsorted statements of any bank, each one routed to its extractor
+        (ConstGl.PATH_TO_BANK_DATA_INBOX,
+         ExtractorRegistry([hello_bank_extractor, bnp_extractor, sg_extractor, revolut_extractor], result_cache)),
     ]
-    transaction_categorizer = TransactionCategorizer()
-    for bank_path, extractor in banks_path_tuples:
-        all_transactions.extend(extract_transactions(bank_path, extractor, result_hasher))
 
+def update_outputs(banks_path_tuples: list[tuple[str, BankStatementExtractor]],
+                   result_hasher: ResultFileCache,
+                   transaction_categorizer: TransactionCategorizer,
+                   full: bool = False,
+                   jobs: int = 1,
+                   interactive: bool = True) -> str:
+    """
+    Add the new or changed statements to the outputs (or rebuild them from all statements when full).
+    The cache and the categorizer can be kept between calls, e.g. by the watch daemon.
+
+    :param interactive: whether the user is asked the category of the transactions without a matching rule,
+        see categorize_transactions
 
-    for transaction in tqdm(all_transactions, desc="Categorizing transactions"):
-        if transaction_categorizer.is_need_categorization(transaction, 50000):
-            transaction_categorizer.categorize(transaction, True)
+    :return: path of the transactions workbook
+    """
+    # documents that already contributed to the outputs are not loaded nor categorized again
+    run_manifest_file = ConstGl.PATH_TO_BANK_RUN_MANIFEST
+    xlsx_file = ConstGl.PATH_TO_BANK_RESULT + '/all_transactions.xlsx'
+    previous_manifest = {}
+    if not full and os.path.exists(xlsx_file) and transaction_dataset.has_complete_dataset():
+        previous_manifest = run_manifest.load_run_manifest(run_manifest_file)
+    with tracing.span("compute_run_manifest"):
+        current_manifest = compute_run_manifest(banks_path_tuples, result_hasher)
+    new_documents = {doc_path for doc_path, file_hash in current_manifest.items()
+                     if previous_manifest.get(doc_path) != file_hash}
+    outdated_documents = {doc_path for doc_path, file_hash in previous_manifest.items()
+                          if current_manifest.get(doc_path) != file_hash}
+    if previous_manifest and not new_documents and not outdated_documents:
+        print("No new or changed statement, outputs are up to date")
+        return xlsx_file
+    print(f"Statements to add: {len(new_documents)}, to remove: {len(outdated_documents)}")
+    # the dataframe and report libraries are only loaded when the outputs change
+    from bank.report import transaction_workbook
+
+    all_transactions = TransactionTable()
+    with tracing.span("extract_transactions", documents=len(new_documents), jobs=jobs):
+        if jobs > 1:
+            all_transactions.extend(
+                extract_transactions_parallel(banks_path_tuples, result_hasher, jobs, new_documents))
         else:
-            transaction_categorizer.categorize(transaction, False)
+            for bank_path, extractor in banks_path_tuples:
+                all_transactions.extend(extract_transactions(bank_path, extractor, result_hasher, new_documents))
 
+    with tracing.span("categorize_transactions", rows=len(all_transactions)):
+        uncategorized_positions = categorize_transactions(all_transactions, transaction_categorizer, interactive)
+    # statements added with transactions left without category are saved as changed (no hash),
+    # so that the next interactive run asks about them
+    for position in uncategorized_positions:
+        current_manifest[all_transactions.proof_document[position]] = None
+    # dataset partitions holding transactions of the new or outdated statements, all of them on a full rebuild
+    touched_partitions = None
+    with tracing.span("merge_previous_transactions"):
+        if previous_manifest:
+            # merge the new transactions into the ones of the previous run
+            previous_transactions = transaction_dataset.read_transactions_table()
+            outdated_positions = [position for position, doc_path in enumerate(previous_transactions.proof_document)
+                                  if doc_path in outdated_documents]
+            touched_partitions = (
+                transaction_dataset.transaction_partitions(previous_transactions.take(outdated_positions))
+                | transaction_dataset.transaction_partitions(all_transactions))
+            outdated_positions = set(outdated_positions)
+            previous_transactions = previous_transactions.take(
+                position for position in range(len(previous_transactions)) if position not in outdated_positions)
+            previous_transactions.extend(all_transactions)
+            all_transactions = previous_transactions
+        # same row order as a full rebuild
+        all_transactions = sort_transactions(all_transactions)
 
-    xlsx_file = ConstGl.PATH_TO_BANK_RESULT + '/all_transactions.xlsx'
-    all_transactions_dict = [transaction.model_dump() for transaction in all_transactions]
-    df = pd.DataFrame(all_transactions_dict)
-    # Convert Decimal columns to float
-    for col in df.columns:
-        if pd.api.types.is_object_dtype(df[col]):
-            df[col] = df[col].apply(lambda x: float(x) if isinstance(x, Decimal) else x)
-
-    parent_directory = os.path.dirname(xlsx_file)
-    os.makedirs(parent_directory, exist_ok=True)
-    df.to_excel(xlsx_file, index=False)
+    with tracing.span("write_transaction_dataset", rows=len(all_transactions)):
+        rewritten_partitions = transaction_dataset.write_transaction_dataset(all_transactions,
+                                                                             partitions=touched_partitions)
+    print(f"Transaction dataset partitions rewritten: {len(rewritten_partitions)}")
+
+    with tracing.span("write_transactions_xlsx", rows=len(all_transactions)):
+        transaction_workbook.write_transactions_xlsx(all_transactions, xlsx_file)
+    run_manifest.save_run_manifest(run_manifest_file, current_manifest)
+    return xlsx_file
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Extract, categorize and export all bank statements transactions")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of processes used to extract statements missing from the cache")
+    parser.add_argument("--page-jobs", type=int, default=1,
+                        help="number of processes used to extract the pages of a single long BNP or SG statement")
+    parser.add_argument("--backend", choices=pdf_page_analysis.BACKENDS, default=pdf_page_analysis.PDFPLUMBER_BACKEND,
+                        help="library reading the BNP and SG statements, pymupdf is faster and gives the same rows")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild the outputs from all statements instead of only adding new or changed ones")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time spent per stage and per document, and write a Chrome trace")
+    args = parser.parse_args(argv)
+    if args.profile:
+        tracing.enable()
+
+    print("main")
+    setup_dirs()
+    result_cache = ResultFileCache()
+    try:
+        with tracing.span("update_outputs"):
+            xlsx_file = update_outputs(get_banks_path_tuples(args.page_jobs, args.backend, result_cache),
+                                       result_cache, TransactionCategorizer(), args.full, args.jobs)
+    finally:
+        if args.profile:
+            tracing.print_report()
+            tracing.write_chrome_trace(os.path.join(ConstGl.TEMP_DIR, 'profile', 'bank_calculator_trace.json'))
     os_util.open_with_associated_program(xlsx_file)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
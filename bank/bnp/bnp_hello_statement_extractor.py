@@ -2,12 +2,14 @@ import re
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
 
-import pdfplumber
-
 from bank.bnp.bnp_statement_extractor import BNPStatementExtractor
 from bank.generic.bank_statement_extractor import BankStatementExtractor
+from bank.generic.document_sample import DocumentSample
 from bank.model.transaction import BankStatement, Transaction
 
 
 class BNPHelloStatementExtractor(BNPStatementExtractor):
-    BANK_NOMINATION = "Hello Bank"
\ No newline at end of file
+    BANK_NOMINATION = "Hello Bank"
+
+    def sniff(self, sample: DocumentSample) -> bool:
+        return self._sniff_layout(sample) and self.HELLO_BANK_PATTERN.search(sample.first_page_text) is not None
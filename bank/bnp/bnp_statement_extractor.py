@@ -1,16 +1,20 @@
 import re
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from typing import Iterator, Optional
 
-import pdfplumber
-
+from bank.generic import pdf_page_analysis, pdf_words_tables
 from bank.generic.bank_statement_extractor import BankStatementExtractor
-from bank.model.transaction import BankStatement, Transaction
+from bank.generic.document_sample import DocumentSample
+from bank.generic.pdf_layout_template import LayoutTableFinder, LayoutTemplate
+from bank.model.transaction import BankStatement
+from bank.model.transaction_table import TransactionTable
 from util import numeric_parser
 
 
 class BNPStatementExtractor(BankStatementExtractor):
     BANK_NOMINATION = "BNP"
+    FILE_EXTENSIONS = (".pdf",)
     french_months = {
         "janvier": "01",
         "février": "02",
@@ -39,6 +43,26 @@ class BNPStatementExtractor(BankStatementExtractor):
         "horizontal_strategy": "text", "snap_y_tolerance": 0,
         "intersection_x_tolerance": 15
     }
+    # pattern example: ".... du 6 janvier 2024 au 6 février 2024 ...."
+    STATEMENT_DATES_PATTERN = r"du (\d{1,2}) (\w+) (\d{4}) au (\d{1,2}) (\w+) (\d{4})"
+    # Hello Bank statements share the BNP layout, they are told apart by the brand name
+    HELLO_BANK_PATTERN = re.compile(r"hello ?bank", re.IGNORECASE)
+
+    # column lines of the transactions table, learned from the first page of each statement when not declared
+    # (print it with: python -m bank.generic.pdf_layout_template <statement.pdf> --bank <bnp|sg>)
+    LAYOUT_TEMPLATE: Optional[LayoutTemplate] = None
+
+    def __init__(self, page_jobs: int = 1, backend: str = pdf_page_analysis.PDFPLUMBER_BACKEND):
+        """
+        :param page_jobs: number of processes extracting the page tables of a statement, useful for long statements
+            (pdfplumber backend only)
+        :param backend: library reading the pages, pdf_page_analysis.PYMUPDF_BACKEND is several times faster
+        """
+        if backend not in pdf_page_analysis.BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {pdf_page_analysis.BACKENDS}")
+        self.page_jobs = page_jobs
+        self.backend = backend
+        self.table_finder = LayoutTableFinder(self.TABLE_SETTINGS, len(self.TABLE_COLUMNS_INDEX), self.LAYOUT_TEMPLATE)
 
     def _normalize_text(self, text: str) -> str:
         # special character like 'é' is not recognized by the regex pattern
@@ -48,12 +72,10 @@ class BNPStatementExtractor(BankStatementExtractor):
         return text
 
     def _extract_start_end_dates(self, text: str) -> tuple[datetime, datetime]:
-        # pattern example: ".... du 6 janvier 2024 au 6 février 2024 ...."
         start_date = None
         end_date = None
-        pattern_date = r"du (\d{1,2}) (\w+) (\d{4}) au (\d{1,2}) (\w+) (\d{4})"
         text = self._normalize_text(text)
-        match = re.search(pattern_date, text)
+        match = re.search(self.STATEMENT_DATES_PATTERN, text)
         if match:
             start_day, start_month, start_year, end_day, end_month, end_year = match.groups()
             start_month = self.french_months.get(start_month)
@@ -63,6 +85,14 @@ class BNPStatementExtractor(BankStatementExtractor):
 
         return start_date, end_date
 
+    def _sniff_layout(self, sample: DocumentSample) -> bool:
+        # the statement dates sentence of the first page, as read by _extract_start_end_dates
+        return sample.is_pdf and re.search(self.STATEMENT_DATES_PATTERN,
+                                           self._normalize_text(sample.first_page_text)) is not None
+
+    def sniff(self, sample: DocumentSample) -> bool:
+        return self._sniff_layout(sample) and not self.HELLO_BANK_PATTERN.search(sample.first_page_text)
+
     def _parse_transaction_date(self, date_str, start_date, end_date) -> datetime:
         if not date_str or len(date_str.strip()) != 5:
             return None
@@ -72,15 +102,15 @@ class BNPStatementExtractor(BankStatementExtractor):
 
     def extract_statement(self, pdf_path: str) -> BankStatement:
         bank_statement = BankStatement(proof_document=pdf_path)
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page_text = pdf.pages[0].extract_text(x_tolerance=2)
-            start_date, end_date = self._extract_start_end_dates(first_page_text)
-            bank_statement.start_date = start_date
-            bank_statement.end_date = end_date
-            for page in pdf.pages:
-                table = page.extract_table(BNPStatementExtractor.TABLE_SETTINGS)
-                if not table:
-                    continue
+        transaction_table = TransactionTable()
+        start_date, end_date = None, None
+        for page_analysis in self._iter_pages_analysis(pdf_path):
+            if page_analysis.text is not None:
+                # first page, read before its rows since they need the statement dates
+                start_date, end_date = self._extract_start_end_dates(page_analysis.text)
+                bank_statement.start_date = start_date
+                bank_statement.end_date = end_date
+            for table in page_analysis.tables:
                 for row in table:
                     if row[self.TABLE_COLUMNS_INDEX["date_month_dot_day"]] == "Date":
                         # header row
@@ -88,10 +118,31 @@ class BNPStatementExtractor(BankStatementExtractor):
                     # if all columns are empty, skip the row
                     if all(not cell for cell in row):
                         continue
-                    self.process_row(row, bank_statement, start_date, end_date)
+                    self.process_row(row, bank_statement, transaction_table, start_date, end_date)
+        bank_statement.set_transaction_table(transaction_table)
         return bank_statement
 
-    def process_row(self, row: list, bank_statement: BankStatement, start_date: datetime, end_date: datetime):
+    def _iter_pages_analysis(self, pdf_path: str) -> Iterator[pdf_page_analysis.PageAnalysis]:
+        self.table_finder.start_document()
+        if self.backend == pdf_page_analysis.PYMUPDF_BACKEND:
+            return pdf_words_tables.iter_pages_analysis(pdf_path, self._analyse_words_page)
+        return pdf_page_analysis.iter_pages_analysis(pdf_path, self._analyse_page, self.page_jobs)
+
+    def _analyse_page(self, page) -> pdf_page_analysis.PageAnalysis:
+        table = self.table_finder.extract_table(page)
+        # the statement dates are only written on the first page
+        text = page.extract_text(x_tolerance=2) if page.page_number == 1 else None
+        return pdf_page_analysis.PageAnalysis(page.page_number, [table] if table else [], text)
+
+    def _analyse_words_page(self, page) -> pdf_page_analysis.PageAnalysis:
+        # same analysis as _analyse_page, from the PyMuPDF words of the page
+        words = page.get_text("words")
+        table = pdf_words_tables.extract_table(page, words)
+        text = pdf_words_tables.page_text(words) if page.number == 0 else None
+        return pdf_page_analysis.PageAnalysis(page.number + 1, [table] if table else [], text)
+
+    def process_row(self, row: list, bank_statement: BankStatement, transaction_table: TransactionTable,
+                    start_date: datetime, end_date: datetime):
         date_month_dot_day = row[self.TABLE_COLUMNS_INDEX["date_month_dot_day"]]
         transaction_date = self._parse_transaction_date(date_month_dot_day, start_date, end_date)
 
@@ -115,16 +166,10 @@ class BNPStatementExtractor(BankStatementExtractor):
             # ['SOLDE CREDITEUR AU 06.02.2024', None, None, '', '763,61']
             bank_statement.final_credit_balance = incoming_amount
         elif is_incoming or is_outgoing:
-            bank_statement.transactions.append(Transaction(
-                bank_nomination=self.BANK_NOMINATION,
-                transaction_date=transaction_date,
-                description=description,
-                expense_amount=expense_amount,
-                income_amount=incoming_amount,
-                proof_document=bank_statement.proof_document
-            ))
+            transaction_table.append(self.BANK_NOMINATION, transaction_date, description,
+                                     expense_amount, incoming_amount, bank_statement.proof_document)
         elif description:
-            bank_statement.transactions[-1].description += description
+            transaction_table.append_to_last_description(description)
 
 
 def main():
@@ -1,12 +1,30 @@
+from bank.generic.document_sample import DocumentSample
 from bank.model.transaction import BankStatement
+from util import tracing
 
 
 class BankStatementExtractor:
     BANK_NOMINATION = "Generic"
+    # extensions of the statement files, other files of the bank directory (e.g. desktop.ini) are not extracted
+    FILE_EXTENSIONS: tuple[str, ...] = ()
+
     def extract_statement(self, statement_doc: str) -> BankStatement:
         raise NotImplementedError
 
     def extract_and_validate(self, statement_doc: str) -> BankStatement:
-        bank_statement = self.extract_statement(statement_doc)
-        bank_statement.validate_statement()
-        return bank_statement
\ No newline at end of file
+        with tracing.span(f"{type(self).__name__}.extract_statement", document=statement_doc):
+            bank_statement = self.extract_statement(statement_doc)
+        with tracing.span("validate_statement", document=statement_doc):
+            bank_statement.validate_statement()
+        return bank_statement
+
+    def is_statement_file(self, doc_path: str) -> bool:
+        """Whether a file of the bank directory is extracted, from its name only."""
+        return not self.FILE_EXTENSIONS or doc_path.lower().endswith(self.FILE_EXTENSIONS)
+
+    def sniff(self, sample: DocumentSample) -> bool:
+        """
+        Cheap guess, from the first bytes or the first page text, of whether the document is a statement
+        of this extractor, to route the files of a mixed folder without parsing them.
+        """
+        return False
@@ -0,0 +1,58 @@
+"""
+The cheap part of a document the extractors look at to recognize their statements (see BankStatementExtractor.sniff):
+its first bytes and, for a PDF, the text of its first page. Both are read at most once, whatever the number of
+extractors asked.
+"""
+from typing import Optional
+
+PDF_SIGNATURE = b'%PDF'
+
+
+class DocumentSample:
+    # enough for the header line of a CSV export
+    HEAD_SIZE = 4096
+
+    def __init__(self, doc_path: str):
+        self.doc_path = doc_path
+        self._head: Optional[bytes] = None
+        self._first_page_text: Optional[str] = None
+
+    @property
+    def head(self) -> bytes:
+        if self._head is None:
+            with open(self.doc_path, 'rb') as f:
+                self._head = f.read(self.HEAD_SIZE)
+        return self._head
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.head.startswith(PDF_SIGNATURE)
+
+    @property
+    def first_line(self) -> str:
+        """First line of a text document, empty when not decodable."""
+        try:
+            return self.head.decode('utf-8-sig').splitlines()[0] if self.head else ''
+        except UnicodeDecodeError:
+            return ''
+
+    @property
+    def first_page_text(self) -> str:
+        """
+        Text of the first page of a PDF, empty for other documents or a PDF that can't be read.
+        Read with pdfplumber's extract_text, like the extractors read the first page, their sniff patterns
+        match the same text (PyMuPDF's own text follows the text blocks and can split or reorder lines).
+        """
+        if self._first_page_text is None:
+            self._first_page_text = ''
+            if self.is_pdf:
+                import pdfplumber
+                from pdfplumber.utils.exceptions import PdfminerException
+                try:
+                    with pdfplumber.open(self.doc_path) as pdf:
+                        if pdf.pages:
+                            self._first_page_text = pdf.pages[0].extract_text(x_tolerance=2)
+                except PdfminerException:
+                    # damaged or encrypted PDF
+                    pass
+        return self._first_page_text
@@ -0,0 +1,83 @@
+import os
+from typing import Optional
+
+from bank.generic.bank_statement_extractor import BankStatementExtractor
+from bank.generic.document_sample import DocumentSample
+from bank.model.transaction import BankStatement
+from util.result_file_cache import ResultFileCache
+
+
+class ExtractorRegistry(BankStatementExtractor):
+    """
+    Extractor of a folder of unsorted statements (e.g. the downloads folder): each file is routed to the first
+    registered extractor whose sniff recognizes it, files no extractor recognizes are not statements and are skipped.
+    It can be used in place of a bank extractor, with the inbox folder as its directory.
+    """
+    BANK_NOMINATION = "Inbox"
+
+    def __init__(self, extractors: list[BankStatementExtractor], result_cache: Optional[ResultFileCache] = None):
+        """
+        :param extractors: the most specific extractors first, e.g. Hello Bank before BNP if their sniff overlap
+        :param result_cache: where the routes are kept by file content hash, a document is sniffed only once
+            across runs
+        """
+        self.extractors = extractors
+        self.result_cache = result_cache
+        # the routes of the cache are only valid for the same extractors, in the same order
+        self.router = '|'.join(type(extractor).__name__ for extractor in extractors)
+        # file -> (modification time, size, index of its extractor or None), the inbox is listed on every run
+        self._routes: dict[str, tuple[float, int, Optional[int]]] = {}
+
+    def __getstate__(self):
+        # sent to the worker processes without the cache connection, the routes found are sent along
+        state = self.__dict__.copy()
+        state['result_cache'] = None
+        return state
+
+    def find_extractor(self, doc_path: str) -> Optional[BankStatementExtractor]:
+        """
+        The extractor of a document, from its first bytes or first page text.
+        Example:
+        >>> registry.find_extractor('data/bank/inbox/RLV_CHQ_300040018600002709179_20240206.pdf')
+        <bank.bnp.bnp_statement_extractor.BNPStatementExtractor object at 0x...>
+        """
+        stat = os.stat(doc_path)
+        route = self._routes.get(doc_path)
+        if route is None or route[:2] != (stat.st_mtime, stat.st_size):
+            if self.result_cache is None:
+                index = self._sniff(doc_path)
+            else:
+                extractor_name = self.result_cache.get_route(doc_path, self.router, self._sniff_name)
+                index = next((i for i, extractor in enumerate(self.extractors)
+                              if type(extractor).__name__ == extractor_name), None)
+            route = (stat.st_mtime, stat.st_size, index)
+            self._routes[doc_path] = route
+        return self.extractors[route[2]] if route[2] is not None else None
+
+    def _sniff(self, doc_path: str) -> Optional[int]:
+        """Index of the first extractor recognizing the document."""
+        sample = DocumentSample(doc_path)
+        return next((i for i, extractor in enumerate(self.extractors) if extractor.sniff(sample)), None)
+
+    def _sniff_name(self, doc_path: str) -> Optional[str]:
+        index = self._sniff(doc_path)
+        return type(self.extractors[index]).__name__ if index is not None else None
+
+    def is_statement_file(self, doc_path: str) -> bool:
+        return self.find_extractor(doc_path) is not None
+
+    def sniff(self, sample: DocumentSample) -> bool:
+        return any(extractor.sniff(sample) for extractor in self.extractors)
+
+    def extract_statement(self, statement_doc: str) -> BankStatement:
+        return self._get_extractor(statement_doc).extract_statement(statement_doc)
+
+    def extract_and_validate(self, statement_doc: str) -> BankStatement:
+        # spans and validation of the routed extractor
+        return self._get_extractor(statement_doc).extract_and_validate(statement_doc)
+
+    def _get_extractor(self, statement_doc: str) -> BankStatementExtractor:
+        extractor = self.find_extractor(statement_doc)
+        if extractor is None:
+            raise ValueError(f"No extractor recognizes {statement_doc}")
+        return extractor
@@ -0,0 +1,146 @@
+import argparse
+from typing import TYPE_CHECKING, Optional
+
+from bank.generic.pdf_page_analysis import Table
+
+if TYPE_CHECKING:
+    import pdfplumber
+
+
+class LayoutTemplate:
+    """
+    Column boundaries, the x positions of the ruled vertical lines, of the transactions table of a bank layout.
+    Tables are then extracted from the page cropped to these lines with explicit vertical lines,
+    instead of detecting tables among every line and word of the page.
+    """
+    # maximum distance, in points, between a ruled line of the page and a column boundary of the template
+    X_TOLERANCE = 2
+
+    def __init__(self, column_lines: list[float]):
+        self.column_lines = sorted(column_lines)
+
+    def __repr__(self) -> str:
+        return f"LayoutTemplate({self.column_lines})"
+
+    @classmethod
+    def learn(cls, tables: list['pdfplumber.table.Table'], min_columns: int) -> Optional['LayoutTemplate']:
+        """
+        Template of the first table with at least min_columns columns, among the tables found on a page.
+        Example:
+        >>> LayoutTemplate.learn(page.find_tables(SGStatementExtractor.TABLE_SETTINGS), 5)
+        LayoutTemplate([28.35, 198.43, 249.45, 433.7, 498.9, 566.93])
+        """
+        for table in tables:
+            column_lines = sorted({round(cell[0], 2) for cell in table.cells}
+                                  | {round(cell[2], 2) for cell in table.cells})
+            if len(column_lines) - 1 >= min_columns:
+                return cls(column_lines)
+        return None
+
+    def find_table_bbox(self, page: 'pdfplumber.page.Page') -> Optional[tuple[float, float, float, float]]:
+        """
+        Bounding box of the table on the page: from the first to the last column line, over the height where
+        every column line is drawn. Lines of other elements (e.g. aligned with the page margin) don't widen it.
+
+        :return: None when the page does not follow the template: a column line is missing (e.g. a page without
+            the table, or a table with fewer columns) or another vertical line crosses the table
+        """
+        vertical_edges = page.vertical_edges
+        column_edges = []
+        for x in self.column_lines:
+            edges = [edge for edge in vertical_edges if abs(edge['x0'] - x) <= self.X_TOLERANCE]
+            if not edges:
+                return None
+            column_edges.append(edges)
+        top = max(min(edge['top'] for edge in edges) for edges in column_edges)
+        bottom = min(max(edge['bottom'] for edge in edges) for edges in column_edges)
+        if bottom <= top:
+            return None
+        x0, x1 = self.column_lines[0] - self.X_TOLERANCE, self.column_lines[-1] + self.X_TOLERANCE
+        for edge in vertical_edges:
+            if x0 < edge['x0'] < x1 and edge['top'] < bottom and edge['bottom'] > top \
+                    and all(abs(edge['x0'] - x) > self.X_TOLERANCE for x in self.column_lines):
+                return None
+        return x0, top, x1, bottom
+
+
+class LayoutTableFinder:
+    """
+    Finds the tables of statement pages with the layout template of the bank, declared or learned from the first
+    page with a table of each statement (see start_document). Pages that don't follow the template (e.g. a page
+    without the table, or a layout change) are searched as a whole with the table settings of the extractor.
+    """
+    def __init__(self, table_settings: dict, min_columns: int, layout_template: Optional[LayoutTemplate] = None):
+        """
+        :param table_settings: pdfplumber table settings of the extractor
+        :param min_columns: minimum number of columns of the transactions table, to learn the template
+        :param layout_template: declared template, learned when None
+        """
+        self.table_settings = table_settings
+        self.min_columns = min_columns
+        self.declared_layout_template = layout_template
+        self.layout_template = layout_template
+        self._text_settings: Optional[dict] = None
+
+    def start_document(self):
+        """Forget the template learned from the previous statement, the layout of the next one may be shifted."""
+        self.layout_template = self.declared_layout_template
+
+    @property
+    def text_settings(self) -> dict:
+        """Text settings of the table settings, resolved by pdfplumber on first use."""
+        if self._text_settings is None:
+            from pdfplumber.table import TableSettings
+            self._text_settings = TableSettings.resolve(self.table_settings).text_settings or {}
+        return self._text_settings
+
+    def find_tables(self, page: 'pdfplumber.page.Page') -> list['pdfplumber.table.Table']:
+        bbox = self.layout_template.find_table_bbox(page) if self.layout_template else None
+        if bbox is not None:
+            column_lines = self.layout_template.column_lines
+            # pdfplumber stretches the text rows over the words of the whole page, usually wider than the table
+            # (headers, legal text), the rows of the cropped page must still reach every column line
+            template_settings = dict(self.table_settings, vertical_strategy="explicit",
+                                     explicit_vertical_lines=column_lines,
+                                     intersection_x_tolerance=column_lines[-1] - column_lines[0])
+            return page.crop(bbox).find_tables(template_settings)
+        tables = page.find_tables(self.table_settings)
+        if self.layout_template is None:
+            self.layout_template = LayoutTemplate.learn(tables, self.min_columns)
+        return tables
+
+    def extract_tables(self, page: 'pdfplumber.page.Page') -> list[Table]:
+        """Same rows as page.extract_tables(table_settings)."""
+        return [table.extract(**self.text_settings) for table in self.find_tables(page)]
+
+    def extract_table(self, page: 'pdfplumber.page.Page') -> Optional[Table]:
+        """Same rows as page.extract_table(table_settings): the largest table, as measured by number of cells."""
+        tables = self.find_tables(page)
+        if not tables:
+            return None
+        largest = min(tables, key=lambda table: (-len(table.cells), table.bbox[1], table.bbox[0]))
+        return largest.extract(**self.text_settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the layout template learned from a statement, to declare it")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--bank", choices=["bnp", "sg"], required=True)
+    args = parser.parse_args()
+
+    import pdfplumber
+    from bank.bnp.bnp_statement_extractor import BNPStatementExtractor
+    from bank.sg.sg_statement_extractor import SGStatementExtractor
+    extractor_class = {"bnp": BNPStatementExtractor, "sg": SGStatementExtractor}[args.bank]
+    with pdfplumber.open(args.pdf_path) as pdf:
+        for page in pdf.pages:
+            layout_template = LayoutTemplate.learn(page.find_tables(extractor_class.TABLE_SETTINGS),
+                                                   len(extractor_class.TABLE_COLUMNS_INDEX))
+            if layout_template:
+                print(layout_template)
+                return
+    print("No table found")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+from util import tracing
+
+if TYPE_CHECKING:
+    import pdfplumber
+
+Table = list[list[str]]
+
+# libraries the statement pages can be read with, see pdf_words_tables for PyMuPDF
+PDFPLUMBER_BACKEND = "pdfplumber"
+PYMUPDF_BACKEND = "pymupdf"
+BACKENDS = (PDFPLUMBER_BACKEND, PYMUPDF_BACKEND)
+
+
+class PageAnalysis:
+    """
+    Everything the extractors need from a page, computed from a single pdfminer layout analysis of the page:
+    its raw tables and, when requested, its text.
+    """
+    __slots__ = ('page_number', 'tables', 'text')
+
+    def __init__(self, page_number: int, tables: list[Table], text: Optional[str] = None):
+        self.page_number = page_number
+        self.tables = tables
+        self.text = text
+
+
+PageAnalyser = Callable[['pdfplumber.page.Page'], PageAnalysis]
+
+# below this number of pages, starting worker processes costs more than it saves
+MIN_PAGES_FOR_PARALLEL = 8
+# clustering of the characters of a text line, pdfplumber's extract_text y_tolerance
+LINE_TOLERANCE = 3
+
+
+def page_contains(page: 'pdfplumber.page.Page', words: str) -> bool:
+    """
+    Cheap test of whether words are written on the page, from the characters of the layout analysis,
+    to only run the costlier text extraction on pages that need it.
+    Characters are read line by line from left to right, like extract_text does, not in the order
+    of the content stream (glyphs of a PDF may be drawn in any order).
+    Example:
+    >>> page_contains(page, 'NOUVEAU SOLDE')
+    True
+    """
+    lines = []
+    for char in sorted((char for char in page.chars if char['text'] != ' '), key=lambda char: char['top']):
+        if lines and char['top'] - lines[-1][0]['top'] <= LINE_TOLERANCE:
+            lines[-1].append(char)
+        else:
+            lines.append([char])
+    text = ''.join(char['text'] for line in lines for char in sorted(line, key=lambda char: char['x0']))
+    return words.replace(' ', '') in text
+
+
+def analyse_page(page: 'pdfplumber.page.Page', page_analyser: PageAnalyser) -> PageAnalysis:
+    """Analyse the page then release its layout, chars and edges: each page is analysed exactly once."""
+    try:
+        return page_analyser(page)
+    finally:
+        page.close()
+
+
+def _analyse_pages_range(pdf_path: str,
+                         start_page: int,
+                         end_page: int,
+                         page_analyser: PageAnalyser) -> list[PageAnalysis]:
+    import pdfplumber
+    pages_analysis = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for i in range(start_page, end_page):
+            with tracing.span("analyse_page", document=pdf_path, page=i + 1):
+                pages_analysis.append(analyse_page(pdf.pages[i], page_analyser))
+    return pages_analysis
+
+
+def iter_pages_analysis(pdf_path: str,
+                        page_analyser: PageAnalyser,
+                        page_jobs: int = 1) -> Iterator[PageAnalysis]:
+    """
+    Yield the analysis of each page of the pdf, in page order, so the extractors read every page in a single pass.
+    When page_jobs > 1, page ranges are analysed by worker processes (each one opening the pdf),
+    the caller still receives the pages in order so stateful row processing keeps working.
+    The spans of the worker processes are added to the trace of the caller.
+
+    :param pdf_path: path of the pdf, also opened by the worker processes
+    :param page_analyser: picklable function returning the analysis of a page
+    :param page_jobs: number of worker processes
+    """
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        if page_jobs <= 1 or page_count < MIN_PAGES_FOR_PARALLEL:
+            for page in pdf.pages:
+                with tracing.span("analyse_page", document=pdf_path, page=page.page_number):
+                    page_analysis = analyse_page(page, page_analyser)
+                yield page_analysis
+            return
+
+    chunk_size = -(-page_count // page_jobs)
+    starts = list(range(0, page_count, chunk_size))
+    ends = [min(start + chunk_size, page_count) for start in starts]
+    with ProcessPoolExecutor(max_workers=page_jobs) as executor, \
+            tracing.span("analyse_pages", document=pdf_path, pages=page_count, page_jobs=page_jobs):
+        if tracing.is_enabled():
+            # spans of the worker processes are sent back with the pages
+            for pages_analysis, events in executor.map(tracing.run_collecting_events,
+                                                       [_analyse_pages_range] * len(starts),
+                                                       [pdf_path] * len(starts), starts, ends,
+                                                       [page_analyser] * len(starts)):
+                tracing.add_events(events)
+                yield from pages_analysis
+        else:
+            for pages_analysis in executor.map(_analyse_pages_range,
+                                               [pdf_path] * len(starts), starts, ends,
+                                               [page_analyser] * len(starts)):
+                yield from pages_analysis
@@ -0,0 +1,140 @@
+"""
+Ruled tables of a PDF page rebuilt from PyMuPDF word boxes and vector lines, several times faster than pdfplumber.
+The rows are the ones the extractors read from pdfplumber with their settings (vertical strategy "lines",
+horizontal strategy "text"), without the empty rows pdfplumber adds between text lines.
+"""
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+from bank.generic.pdf_page_analysis import PageAnalysis, Table
+from util import tracing
+
+if TYPE_CHECKING:
+    import fitz  # PyMuPDF
+
+# same tolerances as the pdfplumber defaults: snapping / joining of the ruled lines, minimum line length
+# and clustering of the words of a text row by their top
+SNAP_TOLERANCE = 3
+JOIN_TOLERANCE = 3
+MIN_EDGE_LENGTH = 3
+ROW_TOLERANCE = 1
+# clustering of the words of a text line, pdfplumber's extract_text y_tolerance
+LINE_TOLERANCE = 3
+
+Word = tuple[float, float, float, float, str, int, int, int]
+
+
+def _vertical_edges(page: 'fitz.Page') -> list[tuple[float, float, float]]:
+    """(x, top, bottom) of the vertical lines of the page, drawn as lines or as the sides of rectangles."""
+    edges = []
+    for drawing in page.get_drawings():
+        for item in drawing["items"]:
+            if item[0] == "l" and abs(item[1].x - item[2].x) < 1:
+                top, bottom = sorted((item[1].y, item[2].y))
+                edges.append((item[1].x, top, bottom))
+            elif item[0] == "re":
+                rect = item[1]
+                edges += [(rect.x0, rect.y0, rect.y1), (rect.x1, rect.y0, rect.y1)]
+    return [edge for edge in edges if edge[2] - edge[1] >= MIN_EDGE_LENGTH]
+
+
+def _cluster(values: list[float], tolerance: float) -> list[list[float]]:
+    clusters = []
+    for value in sorted(values):
+        if clusters and value - clusters[-1][-1] <= tolerance:
+            clusters[-1].append(value)
+        else:
+            clusters.append([value])
+    return clusters
+
+
+def _group_rows(words: list[Word], tolerance: float) -> list[list[Word]]:
+    """Words of each text row, top to bottom: tops chained by less than tolerance, then sorted left to right."""
+    rows = []
+    for word in sorted(words, key=lambda word: word[1]):
+        if rows and word[1] - rows[-1][-1][1] <= tolerance:
+            rows[-1].append(word)
+        else:
+            rows.append([word])
+    return [sorted(row, key=lambda word: word[0]) for row in rows]
+
+
+def find_ruled_tables(page: 'fitz.Page') -> list[tuple[list[float], float, float]]:
+    """
+    Column lines, top and bottom of each table of the page: groups of vertical lines overlapping vertically.
+    Lines closer than SNAP_TOLERANCE are snapped to their mean x position, like pdfplumber does.
+    """
+    edges = sorted(_vertical_edges(page), key=lambda edge: edge[1])
+    groups = []
+    for edge in edges:
+        if groups and edge[1] <= groups[-1][2] + JOIN_TOLERANCE:
+            groups[-1][0].append(edge[0])
+            groups[-1][2] = max(groups[-1][2], edge[2])
+        else:
+            groups.append([[edge[0]], edge[1], edge[2]])
+    tables = []
+    for xs, top, bottom in groups:
+        column_lines = [sum(cluster) / len(cluster) for cluster in _cluster(xs, SNAP_TOLERANCE)]
+        if len(column_lines) >= 2:
+            tables.append((column_lines, top, bottom))
+    return tables
+
+
+def extract_tables(page: 'fitz.Page', words: Optional[list[Word]] = None) -> list[Table]:
+    """
+    Rows of the ruled tables of the page, each cell being the words whose center is in the column, joined by spaces.
+    Example:
+    >>> extract_tables(fitz.open('statement.pdf')[0])
+    [[['Date', 'Nature des opérations', 'Valeur', 'Débit', 'Crédit'], ['', 'SOLDE CREDITEUR AU 06.01.2024', '', '', '1 386,62'], ...]]
+
+    :param words: page.get_text("words") when already computed
+    """
+    if words is None:
+        words = page.get_text("words")
+    tables = []
+    for column_lines, top, bottom in find_ruled_tables(page):
+        table_words = [word for word in words
+                       if column_lines[0] <= (word[0] + word[2]) / 2 < column_lines[-1]
+                       and top - JOIN_TOLERANCE <= word[1] and word[3] <= bottom + JOIN_TOLERANCE]
+        if not table_words:
+            continue
+        rows = []
+        for row_words in _group_rows(table_words, ROW_TOLERANCE):
+            cells = [[] for _ in range(len(column_lines) - 1)]
+            for word in row_words:
+                center = (word[0] + word[2]) / 2
+                column = next(i for i in range(len(cells)) if center < column_lines[i + 1])
+                cells[column].append(word[4])
+            rows.append([' '.join(cell) for cell in cells])
+        tables.append(rows)
+    return tables
+
+
+def extract_table(page: 'fitz.Page', words: Optional[list[Word]] = None) -> Optional[Table]:
+    """The largest table of the page, as measured by number of cells, like pdfplumber's page.extract_table."""
+    tables = extract_tables(page, words)
+    if not tables:
+        return None
+    return max(tables, key=lambda table: len(table) * len(table[0]))
+
+
+def page_text(words: list[Word]) -> str:
+    """
+    Text of the page line by line, words separated by a space, like pdfplumber's page.extract_text:
+    PyMuPDF's own text follows the text blocks, which can split a line (e.g. a label and its amount).
+    """
+    return '\n'.join(' '.join(word[4] for word in row) for row in _group_rows(words, LINE_TOLERANCE))
+
+
+def page_contains(words: list[Word], text: str) -> bool:
+    """Cheap test of whether text is written on the page, from its words read line by line like page_text."""
+    return text.replace(' ', '') in ''.join(word[4] for row in _group_rows(words, LINE_TOLERANCE) for word in row)
+
+
+def iter_pages_analysis(pdf_path: str, page_analyser: Callable[['fitz.Page'], PageAnalysis]) -> Iterator[PageAnalysis]:
+    """Yield the analysis of each page of the pdf opened with PyMuPDF, in page order."""
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as pdf:
+        for page in pdf:
+            with tracing.span("analyse_page", document=pdf_path, page=page.number + 1):
+                page_analysis = page_analyser(page)
+            yield page_analysis
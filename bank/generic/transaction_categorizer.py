@@ -1,24 +1,45 @@
+import bisect
+import functools
 import json
 import os
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 from bank.generic import tr_common_category
 from bank.model.transaction import Transaction
 from bank.model.transaction_category import TransactionCategory, UserTransactionCategory
 from const.const_gl import ConstGl
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class TransactionCategorizer:
+    # maximum number of distinct normalized descriptions whose category is memoized
+    SEARCH_CACHE_SIZE = 8192
+    # user decisions are appended to this journal, next to the user category file, until compacted into it
+    JOURNAL_SUFFIX = '.journal'
+
     def __init__(self, user_category_file_map: str = None):
         if not user_category_file_map:
             user_category_file_map = os.path.join(ConstGl.PATH_TO_BANK_DATA, "user_category_map.json")
         self.user_category_file_map = user_category_file_map
+        self.user_category_journal_file = user_category_file_map + self.JOURNAL_SUFFIX
         self.category_map: dict[str, TransactionCategory] = tr_common_category.COMMON_CATEGORY_MAP.copy()
         loaded_categories = self._load_category_user_file_map()
+        self._replay_journal(loaded_categories)
         self.category_map.update(loaded_categories.category_map)
         loaded_categories.category_map = self.category_map
         self.user_transaction_category = loaded_categories
         self._normalized_category_map = {}
+        # rules are (rule order, key tokens, category), the order being the insertion order of _normalized_category_map
+        # each rule is indexed under a single one of its tokens: all of them must be in a matching description
+        self._token_to_rules: dict[str, list[tuple[int, frozenset[str], TransactionCategory]]] = {}
+        # rules without token match any description
+        self._tokenless_rules: list[tuple[int, frozenset[str], TransactionCategory]] = []
+        self._rule_by_key: dict[str, tuple[int, frozenset[str], TransactionCategory]] = {}
+        self._next_rule_order = 0
+        # memoized category per normalized (upper-cased) description, cleared whenever rules change
+        self._search_rules_cached = functools.lru_cache(maxsize=self.SEARCH_CACHE_SIZE)(self._search_rules)
         self.compute_normalized_map()
 
     def compute_normalized_map(self):
@@ -27,6 +48,68 @@ class TransactionCategorizer:
         for key, value in self.category_map.items():
             normalized_map[key.upper()] = value
         self._normalized_category_map = normalized_map
+        self._compute_token_index()
+        self._search_rules_cached.cache_clear()
+
+    def _compute_token_index(self):
+        self._token_to_rules = {}
+        self._tokenless_rules = []
+        self._rule_by_key = {}
+        for order, (key, value) in enumerate(self._normalized_category_map.items()):
+            self._index_rule(key, value, order)
+        self._next_rule_order = len(self._normalized_category_map)
+
+    def _get_rule_list(self, normalized_key: str) -> list[tuple[int, frozenset[str], TransactionCategory]]:
+        key_split = normalized_key.split()
+        if not key_split:
+            return self._tokenless_rules
+        return self._token_to_rules.setdefault(key_split[0], [])
+
+    def _index_rule(self, normalized_key: str, value: TransactionCategory, order: int):
+        rule = (order, frozenset(normalized_key.split()), value)
+        self._rule_by_key[normalized_key] = rule
+        # keep rules sorted by order, new rules have the highest order and are appended
+        bisect.insort(self._get_rule_list(normalized_key), rule, key=lambda indexed_rule: indexed_rule[0])
+
+    def _unindex_rule(self, normalized_key: str) -> int:
+        rule = self._rule_by_key.pop(normalized_key)
+        self._get_rule_list(normalized_key).remove(rule)
+        return rule[0]
+
+    def add_rule(self, key: str, category: TransactionCategory):
+        """Add or update a single rule, same result as updating category_map then calling compute_normalized_map."""
+        self.category_map[key] = category
+        normalized_key = key.upper()
+        if normalized_key in self._rule_by_key:
+            if self._has_other_key(key):
+                # the category of the normalized key is the one of its last raw key
+                self.compute_normalized_map()
+                return
+            # an updated key keeps its position
+            order = self._unindex_rule(normalized_key)
+        else:
+            order = self._next_rule_order
+            self._next_rule_order += 1
+        self._normalized_category_map[normalized_key] = category
+        self._index_rule(normalized_key, category, order)
+        self._search_rules_cached.cache_clear()
+
+    def _has_other_key(self, key: str) -> bool:
+        """Whether another key of category_map has the same normalized key."""
+        normalized_key = key.upper()
+        return any(other_key != key and other_key.upper() == normalized_key for other_key in self.category_map)
+
+    def remove_rule(self, key: str):
+        """Remove a single rule, same result as deleting it from category_map then calling compute_normalized_map."""
+        del self.category_map[key]
+        normalized_key = key.upper()
+        if self._has_other_key(key):
+            # another key has the same normalized key, its position and category must be recomputed
+            self.compute_normalized_map()
+            return
+        self._unindex_rule(normalized_key)
+        del self._normalized_category_map[normalized_key]
+        self._search_rules_cached.cache_clear()
 
     def _load_category_user_file_map(self) -> UserTransactionCategory:
         if not self.user_category_file_map or not os.path.exists(self.user_category_file_map):
@@ -38,25 +121,104 @@ class TransactionCategorizer:
         # cast value to enum type
         return UserTransactionCategory(**dic_map)
 
+    def _replay_journal(self, loaded_categories: UserTransactionCategory):
+        """Apply the decisions journaled since the last compaction (e.g. a session interrupted by Ctrl-C)."""
+        if not os.path.exists(self.user_category_journal_file):
+            return
+        with open(self.user_category_journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # partially written last line
+                    continue
+                for key, value in entry.get('category_map', {}).items():
+                    loaded_categories.category_map[key] = TransactionCategory(value)
+                loaded_categories.ignored_transactions_signatures.update(entry.get('ignored_transactions_signatures', []))
+
+    def _append_journal(self, entry: dict):
+        parent_dir = os.path.dirname(self.user_category_journal_file)
+        if parent_dir and not os.path.exists(parent_dir):
+            os.makedirs(parent_dir)
+        with open(self.user_category_journal_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact_journal(self):
+        """Write all decisions to the user category file and drop the journal, to call at the end of a session."""
+        if not os.path.exists(self.user_category_journal_file):
+            return
+        self.save_category_user_file_map()
+        os.remove(self.user_category_journal_file)
+
     def save_category_user_file_map(self):
         parent_dir = os.path.dirname(self.user_category_file_map)
-        if not os.path.exists(parent_dir):
+        if parent_dir and not os.path.exists(parent_dir):
             os.makedirs(parent_dir)
-        with open(self.user_category_file_map, 'w', encoding='utf-8') as f:
+        # write to a temporary file first, an interruption must not leave a truncated file
+        temp_file = self.user_category_file_map + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
             f.write(self.user_transaction_category.model_dump_json(indent=4))
+        os.replace(temp_file, self.user_category_file_map)
 
 
     def search_category(self, transaction: Transaction) -> Optional[TransactionCategory]:
         if  transaction.get_signature() in self.user_transaction_category.ignored_transactions_signatures:
             return transaction.transaction_category
-        description = transaction.description.upper()
-        description_split_set = set(description.split())
-        for key, value in self._normalized_category_map.items():
-            key_split = key.split()
-            # each part of key must be in description
-            if all(part in description_split_set for part in key_split):
-                return value
-        return None
+        return self.search_description_category(transaction.description)
+
+    def search_description_category(self, description: str) -> Optional[TransactionCategory]:
+        """Return the category of the first rule, in insertion order, whose key parts are all in the description."""
+        return self._search_rules_cached(description.upper())
+
+    def search_cache_info(self):
+        """Hits, misses and size of the description category cache."""
+        return self._search_rules_cached.cache_info()
+
+    def _search_rules(self, normalized_description: str) -> Optional[TransactionCategory]:
+        description_split_set = set(normalized_description.split())
+        best_rule = self._tokenless_rules[0] if self._tokenless_rules else None
+        for token in description_split_set:
+            for rule in self._token_to_rules.get(token, ()):
+                if best_rule is not None and rule[0] >= best_rule[0]:
+                    # rules of a posting list are sorted by order
+                    break
+                # each part of key must be in description
+                if rule[1] <= description_split_set:
+                    best_rule = rule
+                    break
+        return best_rule[2] if best_rule else None
+
+    def categorize_frame(self, df: 'pd.DataFrame', minimum_amount_to_ask=0) -> 'pd.Series':
+        """
+        Batch version of categorize without asking the user, over a DataFrame of dumped transactions.
+        The transaction_category column is updated in place for rows matching a rule,
+        each distinct description being searched only once.
+
+        :return: boolean mask of the rows that still need a user decision (see is_need_categorization)
+        """
+        import numpy as np
+        import pandas as pd
+
+        if df.empty:
+            return pd.Series(False, index=df.index)
+        signatures = (df['bank_nomination'] + '_'
+                      + df['transaction_date'].dt.strftime('%Y-%m-%d') + '_'
+                      + df['description'] + '_'
+                      + df['expense_amount'].astype(str) + '_'
+                      + df['income_amount'].astype(str))
+        ignored_mask = signatures.isin(self.user_transaction_category.ignored_transactions_signatures)
+
+        codes, unique_descriptions = pd.factorize(df['description'].str.upper())
+        unique_categories = np.array([self.search_description_category(description)
+                                      for description in unique_descriptions], dtype=object)
+        categories = pd.Series(unique_categories[codes], index=df.index)
+        found_mask = categories.notna() & ~ignored_mask
+        df.loc[found_mask, 'transaction_category'] = categories[found_mask]
+
+        amount_mask = (df['expense_amount'] > minimum_amount_to_ask) | (df['income_amount'] > minimum_amount_to_ask)
+        return ~found_mask & ~ignored_mask & amount_mask
 
     def categorize(self, transaction: Transaction, ask_user: bool) -> Transaction:
         # Categorize transactions based on description
@@ -112,16 +274,19 @@ class TransactionCategorizer:
                 key_description_name = input("Enter a key / pattern description name (Optional): ")
                 if not key_description_name.strip():
                     key_description_name = transaction.description
-                self.category_map[key_description_name] = idx_to_category[idx]
-                self.compute_normalized_map()
+                previous_category = self.category_map.get(key_description_name)
+                self.add_rule(key_description_name, idx_to_category[idx])
                 if self.search_category(transaction):
                     break
-                del self.category_map[key_description_name]
-                self.compute_normalized_map()
+                if previous_category is None:
+                    self.remove_rule(key_description_name)
+                else:
+                    self.add_rule(key_description_name, previous_category)
                 print("Could not deduce the category from given pattern. Please try again.")
             transaction.transaction_category = idx_to_category[idx]
+            self._append_journal({'category_map': {key_description_name: idx_to_category[idx].value}})
         else:
             self.user_transaction_category.ignored_transactions_signatures.add(transaction.get_signature())
+            self._append_journal({'ignored_transactions_signatures': [transaction.get_signature()]})
 
-        self.save_category_user_file_map()
         return transaction
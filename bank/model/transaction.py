@@ -1,10 +1,14 @@
 from datetime import datetime
 from decimal import Decimal
+from typing import TYPE_CHECKING, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr, field_serializer
 
 from bank.model.transaction_category import TransactionCategory
 
+if TYPE_CHECKING:
+    from bank.model.transaction_table import TransactionTable
+
 
 class Transaction(BaseModel):
     bank_nomination: str
@@ -23,6 +27,11 @@ class Transaction(BaseModel):
 
 
 class BankStatement(BaseModel):
+    """
+    Statements extracted by the extractors are backed by their TransactionTable (see set_transaction_table):
+    no Transaction model is built, the table is validated at once and dumped as the transactions field.
+    Statements loaded from JSON hold Transaction models.
+    """
     transactions: list[Transaction] = []
     total_expense: Decimal = Decimal(0)
     total_income: Decimal = Decimal(0)
@@ -32,19 +41,44 @@ class BankStatement(BaseModel):
     end_date: datetime = datetime(1970, 1, 1)
     proof_document: str = ""
 
+    _transaction_table: Optional['TransactionTable'] = PrivateAttr(default=None)
+
+    @property
+    def transaction_table(self) -> 'TransactionTable':
+        """Transactions of the statement as a table, built from the models of a statement loaded from JSON."""
+        if self._transaction_table is None:
+            from bank.model.transaction_table import TransactionTable
+            self._transaction_table = TransactionTable.from_transactions(self.transactions)
+        return self._transaction_table
+
+    def set_transaction_table(self, transaction_table: 'TransactionTable'):
+        """Back the statement by the table, the transactions field is only filled when the statement is dumped."""
+        self._transaction_table = transaction_table
+        self.transactions = []
+
+    @field_serializer('transactions', mode='wrap')
+    def _serialize_transactions(self, transactions: list[Transaction], handler):
+        if self._transaction_table is not None and not transactions:
+            # rows dumped as the Transaction models would be, same fields in the same order
+            return self._transaction_table.to_dicts()
+        return handler(transactions)
+
     def validate_statement(self):
         # validate the statement
-        total_income = sum([transaction.income_amount for transaction in self.transactions])
-        total_expense = sum([transaction.expense_amount for transaction in self.transactions])
+        transaction_table = self.transaction_table
+        transaction_table.validate()
+        total_income = transaction_table.total_income()
+        total_expense = transaction_table.total_expense()
         assert self.total_income == total_income, f"Total income mismatch: {self.total_income} != {total_income}"
         assert self.total_expense == total_expense, f"Total expense mismatch: {self.total_expense} != {total_expense}"
         assert self.final_credit_balance == self.initial_credit_balance + total_income - total_expense, \
             f"Final credit balance mismatch: {self.final_credit_balance} != {self.initial_credit_balance + total_income - total_expense}"
 
     def compute_from_transactions(self):
-        self.total_income = sum([transaction.income_amount for transaction in self.transactions])
-        self.total_expense = sum([transaction.expense_amount for transaction in self.transactions])
+        transaction_table = self.transaction_table
+        self.total_income = transaction_table.total_income()
+        self.total_expense = transaction_table.total_expense()
         self.final_credit_balance = self.initial_credit_balance + self.total_income - self.total_expense
-        self.start_date = min([transaction.transaction_date for transaction in self.transactions])
-        self.end_date = max([transaction.transaction_date for transaction in self.transactions])
-        return self
\ No newline at end of file
+        self.start_date = min(transaction_table.transaction_date)
+        self.end_date = max(transaction_table.transaction_date)
+        return self
@@ -0,0 +1,169 @@
+import json
+import sys
+from datetime import datetime
+from decimal import Decimal
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+from bank.model.transaction import Transaction
+from bank.model.transaction_category import TransactionCategory
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class TransactionTable:
+    """
+    Column oriented, validation free transactions used on the extraction and loading hot paths.
+    Repeated strings (bank, description, proof document) are interned.
+    Amounts are kept as the parsed Decimal values: the transaction signatures (see Transaction.get_signature)
+    of ignored transactions depend on their exact text form.
+    Columns are validated all at once with validate, Transaction models are built only when requested
+    with to_transactions.
+    """
+    COLUMNS = ('bank_nomination', 'transaction_date', 'description', 'expense_amount', 'income_amount',
+               'transaction_category', 'proof_document')
+    # type of the values of each column, the Transaction field types
+    COLUMN_TYPES = {'bank_nomination': str, 'transaction_date': datetime, 'description': str,
+                    'expense_amount': Decimal, 'income_amount': Decimal,
+                    'transaction_category': TransactionCategory, 'proof_document': str}
+    __slots__ = COLUMNS
+
+    def __init__(self):
+        self.bank_nomination: list[str] = []
+        self.transaction_date: list[datetime] = []
+        self.description: list[str] = []
+        self.expense_amount: list[Decimal] = []
+        self.income_amount: list[Decimal] = []
+        self.transaction_category: list[TransactionCategory] = []
+        self.proof_document: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.transaction_date)
+
+    def append(self,
+               bank_nomination: str,
+               transaction_date: datetime,
+               description: str,
+               expense_amount: Decimal,
+               income_amount: Decimal,
+               proof_document: str,
+               transaction_category: TransactionCategory = TransactionCategory.MISCELLANEOUS_OTHER):
+        self.bank_nomination.append(sys.intern(bank_nomination))
+        self.transaction_date.append(transaction_date)
+        self.description.append(sys.intern(description))
+        self.expense_amount.append(expense_amount)
+        self.income_amount.append(income_amount)
+        self.transaction_category.append(transaction_category)
+        self.proof_document.append(sys.intern(proof_document))
+
+    def append_to_last_description(self, description: str):
+        """Continuation of the last transaction description on the next row of a statement table."""
+        self.description[-1] = sys.intern(self.description[-1] + description)
+
+    def extend(self, other: 'TransactionTable'):
+        for column in self.COLUMNS:
+            getattr(self, column).extend(getattr(other, column))
+
+    def total_income(self) -> Decimal:
+        return sum(self.income_amount, Decimal(0))
+
+    def total_expense(self) -> Decimal:
+        return sum(self.expense_amount, Decimal(0))
+
+    @classmethod
+    def from_columns(cls,
+                     bank_nomination: list[str],
+                     transaction_date: list[datetime],
+                     description: list[str],
+                     expense_amount: list[Decimal],
+                     income_amount: list[Decimal],
+                     proof_document: list[str],
+                     transaction_category: Optional[list[TransactionCategory]] = None) -> 'TransactionTable':
+        """Build a table from whole columns of the same length, e.g. parsed from a CSV file in one pass."""
+        table = cls()
+        table.bank_nomination = list(map(sys.intern, bank_nomination))
+        table.transaction_date = transaction_date
+        table.description = list(map(sys.intern, description))
+        table.expense_amount = expense_amount
+        table.income_amount = income_amount
+        table.transaction_category = transaction_category or [TransactionCategory.MISCELLANEOUS_OTHER] * len(transaction_date)
+        table.proof_document = list(map(sys.intern, proof_document))
+        return table
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction]) -> 'TransactionTable':
+        table = cls()
+        for transaction in transactions:
+            table.append(transaction.bank_nomination, transaction.transaction_date, transaction.description,
+                         transaction.expense_amount, transaction.income_amount, transaction.proof_document,
+                         transaction.transaction_category)
+        return table
+
+    @classmethod
+    def from_statement_json(cls, statement_json: str, proof_document: Optional[str] = None) -> 'TransactionTable':
+        """
+        Load the transactions of a BankStatement dumped with model_dump_json (e.g. from ResultFileCache)
+        without building nor validating any model, the dumped statement was validated when extracted.
+
+        :param proof_document: current path of the statement, the cached one may have been renamed or moved
+        """
+        table = cls()
+        for transaction in json.loads(statement_json)['transactions']:
+            table.append(transaction['bank_nomination'],
+                         datetime.fromisoformat(transaction['transaction_date']),
+                         transaction['description'],
+                         Decimal(transaction['expense_amount']),
+                         Decimal(transaction['income_amount']),
+                         proof_document or transaction['proof_document'],
+                         TransactionCategory(transaction['transaction_category']))
+        return table
+
+    def take(self, positions: Iterable[int]) -> 'TransactionTable':
+        """Table of the rows at the given positions, in the order of the positions."""
+        positions = list(positions)
+        table = type(self)()
+        for column in self.COLUMNS:
+            values = getattr(self, column)
+            setattr(table, column, [values[position] for position in positions])
+        return table
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """Rows as tuples of the COLUMNS values, without building any model."""
+        return zip(*(getattr(self, column) for column in self.COLUMNS))
+
+    def to_dicts(self) -> list[dict]:
+        """Rows as dicts of the Transaction fields, e.g. to dump a statement without building models."""
+        return [dict(zip(self.COLUMNS, row)) for row in self.iter_rows()]
+
+    def validate(self):
+        """
+        Validate the whole table in one pass over each column: same length and same value types
+        as the Transaction fields, what to_transactions would check model by model.
+
+        :raise ValueError: on the first invalid column
+        """
+        for column, column_type in self.COLUMN_TYPES.items():
+            values = getattr(self, column)
+            if len(values) != len(self):
+                raise ValueError(f"Column {column} has {len(values)} values, expected {len(self)}")
+            value_types = set(map(type, values))
+            if not value_types <= {column_type}:
+                raise ValueError(f"Column {column} holds {', '.join(sorted(t.__name__ for t in value_types))} "
+                                 f"values, expected {column_type.__name__}")
+
+    def to_transactions(self, positions: Optional[Iterable[int]] = None) -> list[Transaction]:
+        """Build and validate the Transaction models of all rows, or of the given row positions only."""
+        rows = self.iter_rows()
+        if positions is not None:
+            positions = set(positions)
+            rows = (row for position, row in enumerate(rows) if position in positions)
+        # faster than validating a list of dicts with a TypeAdapter, which needs a dict per row
+        return [Transaction(bank_nomination=bank_nomination, transaction_date=transaction_date,
+                            description=description, expense_amount=expense_amount, income_amount=income_amount,
+                            transaction_category=transaction_category, proof_document=proof_document)
+                for bank_nomination, transaction_date, description, expense_amount, income_amount,
+                transaction_category, proof_document in rows]
+
+    def to_frame(self) -> 'pd.DataFrame':
+        import pandas as pd
+        return pd.DataFrame({column: getattr(self, column) for column in self.COLUMNS})
@@ -0,0 +1,222 @@
+"""
+Columnar transaction dataset, partitioned by bank and transaction month (hive layout):
+    -> transactions
+        -> _manifest.json
+        -> bank_nomination=BNP
+            -> year_month=2024-01
+                -> part-0.parquet
+            -> ...
+        -> ...
+"""
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+from decimal import Decimal
+from typing import TYPE_CHECKING, Optional
+
+from bank.model.transaction_category import TransactionCategory
+from bank.model.transaction_table import TransactionTable
+from const.const_gl import ConstGl
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+MANIFEST_FILE_NAME = '_manifest.json'
+PARTITION_FILE_NAME = 'part-0.parquet'
+CENT = Decimal('0.01')
+# version of the partition files schema, partitions of another version are rewritten
+DATASET_VERSION = 2
+
+
+def dataset_schema() -> 'pa.Schema':
+    import pyarrow as pa
+    return pa.schema([
+        ('transaction_date', pa.timestamp('us')),
+        ('description', pa.string()),
+        ('expense_amount', pa.decimal128(18, 2)),
+        ('income_amount', pa.decimal128(18, 2)),
+        ('transaction_category', pa.string()),
+        ('proof_document', pa.string()),
+        # amounts as extracted (e.g. 12.5), the decimal columns being rounded to cents (12.50)
+        ('expense_amount_text', pa.string()),
+        ('income_amount_text', pa.string()),
+    ])
+
+
+def _load_manifest(dataset_dir: str) -> tuple[int, dict[str, Optional[str]]]:
+    """:return: the dataset version and the fingerprint of each partition"""
+    manifest_file = os.path.join(dataset_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_file):
+        return DATASET_VERSION, {}
+    with open(manifest_file, 'r') as f:
+        manifest = json.load(f)
+    if 'version' not in manifest:
+        # first version, the manifest was the fingerprints of the partitions
+        return 1, manifest
+    return manifest['version'], manifest['partitions']
+
+
+def _save_manifest(dataset_dir: str, partitions: dict[str, str]):
+    manifest_file = os.path.join(dataset_dir, MANIFEST_FILE_NAME)
+    with open(manifest_file + '.tmp', 'w') as f:
+        json.dump({'version': DATASET_VERSION, 'partitions': partitions}, f, indent=4, sort_keys=True)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+
+def _partition_dir(dataset_dir: str, bank_nomination: str, year_month: str) -> str:
+    return os.path.join(dataset_dir, f'bank_nomination={bank_nomination}', f'year_month={year_month}')
+
+
+def _to_partition_table(transactions: TransactionTable) -> 'pa.Table':
+    import pyarrow as pa
+    return pa.Table.from_pydict({
+        'transaction_date': transactions.transaction_date,
+        'description': transactions.description,
+        'expense_amount': [amount.quantize(CENT) for amount in transactions.expense_amount],
+        'income_amount': [amount.quantize(CENT) for amount in transactions.income_amount],
+        'transaction_category': [category.value for category in transactions.transaction_category],
+        'proof_document': transactions.proof_document,
+        'expense_amount_text': [str(amount) for amount in transactions.expense_amount],
+        'income_amount_text': [str(amount) for amount in transactions.income_amount],
+    }, schema=dataset_schema())
+
+
+def _fingerprint(table: 'pa.Table') -> str:
+    # rows are serialized in a stable, library independent way
+    hash_sha256 = hashlib.sha256()
+    for row in zip(*(table.column(name).to_pylist() for name in table.column_names)):
+        hash_sha256.update(repr(row).encode('utf-8'))
+    return hash_sha256.hexdigest()
+
+
+def _partition_name(bank_nomination: str, transaction_date: datetime) -> str:
+    return f'{bank_nomination}/{transaction_date.year:04d}-{transaction_date.month:02d}'
+
+
+def transaction_partitions(transactions: TransactionTable) -> set[str]:
+    """
+    Partitions of the dataset holding the transactions.
+    Example:
+    >>> transaction_partitions(transactions)
+    {'BNP/2024-01', 'SG/2024-01'}
+    """
+    return set(map(_partition_name, transactions.bank_nomination, transactions.transaction_date))
+
+
+def write_transaction_dataset(transactions: TransactionTable,
+                              dataset_dir: Optional[str] = None,
+                              partitions: Optional[set[str]] = None) -> list[str]:
+    """
+    Write the transactions as a partitioned Parquet dataset, rows of a partition in the order of the table.
+    Only partitions whose rows changed since the previous run are rewritten,
+    partitions without transactions anymore are removed.
+    Example:
+    >>> write_transaction_dataset(transactions, partitions={'BNP/2024-02'})
+    ['BNP/2024-02']
+
+    :param partitions: the only partitions whose rows may have changed (see transaction_partitions),
+        the other ones are neither fingerprinted nor rewritten. All partitions when None.
+    :return: the rewritten partitions
+    """
+    import pyarrow.parquet as pq
+
+    dataset_dir = dataset_dir or ConstGl.PATH_TO_BANK_TRANSACTIONS_DATASET
+    os.makedirs(dataset_dir, exist_ok=True)
+    previous_version, previous_manifest = _load_manifest(dataset_dir)
+    if previous_version != DATASET_VERSION:
+        # every partition is rewritten in the current schema
+        previous_manifest = dict.fromkeys(previous_manifest)
+        partitions = None
+    if partitions is None:
+        manifest = {}
+    else:
+        manifest = {partition: fingerprint for partition, fingerprint in previous_manifest.items()
+                    if partition not in partitions}
+    rewritten_partitions = []
+
+    partition_positions: dict[str, list[int]] = {}
+    for position, partition in enumerate(map(_partition_name, transactions.bank_nomination,
+                                             transactions.transaction_date)):
+        if partitions is None or partition in partitions:
+            partition_positions.setdefault(partition, []).append(position)
+    for partition in sorted(partition_positions):
+        table = _to_partition_table(transactions.take(partition_positions[partition]))
+        manifest[partition] = _fingerprint(table)
+        bank_nomination, year_month = partition.split('/')
+        partition_dir = _partition_dir(dataset_dir, bank_nomination, year_month)
+        partition_file = os.path.join(partition_dir, PARTITION_FILE_NAME)
+        if previous_manifest.get(partition) == manifest[partition] and os.path.exists(partition_file):
+            continue
+        os.makedirs(partition_dir, exist_ok=True)
+        pq.write_table(table, partition_file + '.tmp')
+        os.replace(partition_file + '.tmp', partition_file)
+        rewritten_partitions.append(partition)
+
+    for partition in previous_manifest.keys() - manifest.keys():
+        bank_nomination, year_month = partition.split('/')
+        shutil.rmtree(_partition_dir(dataset_dir, bank_nomination, year_month), ignore_errors=True)
+
+    _save_manifest(dataset_dir, manifest)
+    return rewritten_partitions
+
+
+def has_complete_dataset(dataset_dir: Optional[str] = None) -> bool:
+    """
+    Whether the dataset holds every partition of its manifest, in the current version,
+    e.g. to merge new transactions into it instead of rebuilding it.
+    """
+    dataset_dir = dataset_dir or ConstGl.PATH_TO_BANK_TRANSACTIONS_DATASET
+    if not os.path.exists(os.path.join(dataset_dir, MANIFEST_FILE_NAME)):
+        return False
+    version, manifest = _load_manifest(dataset_dir)
+    if version != DATASET_VERSION:
+        return False
+    for partition in manifest:
+        bank_nomination, year_month = partition.split('/')
+        if not os.path.exists(os.path.join(_partition_dir(dataset_dir, bank_nomination, year_month),
+                                           PARTITION_FILE_NAME)):
+            return False
+    return True
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([('bank_nomination', pa.string()), ('year_month', pa.string())]), flavor='hive')
+
+
+def read_transaction_dataset(dataset_dir: Optional[str] = None, filters: Optional[list] = None) -> 'pd.DataFrame':
+    """
+    Read the transactions of the dataset, only the partitions matching the filters are read.
+    Example:
+    >>> read_transaction_dataset(filters=[('bank_nomination', '=', 'BNP'), ('year_month', '>=', '2024-01')])
+    """
+    import pyarrow.parquet as pq
+
+    dataset_dir = dataset_dir or ConstGl.PATH_TO_BANK_TRANSACTIONS_DATASET
+    table = pq.read_table(dataset_dir, partitioning=_partitioning(), filters=filters)
+    return table.to_pandas()
+
+
+def read_transactions_table(dataset_dir: Optional[str] = None) -> TransactionTable:
+    """
+    Read the whole dataset back as a transaction table, e.g. to merge the transactions of new statements into it.
+    Amounts are the Decimal values as extracted, not rounded to cents.
+    """
+    dataset_dir = dataset_dir or ConstGl.PATH_TO_BANK_TRANSACTIONS_DATASET
+    if not _load_manifest(dataset_dir)[1]:
+        # no transaction written yet, pyarrow has no file to read the schema from
+        return TransactionTable()
+    import pyarrow.parquet as pq
+    table = pq.read_table(dataset_dir, partitioning=_partitioning())
+    return TransactionTable.from_columns(
+        bank_nomination=table.column('bank_nomination').to_pylist(),
+        transaction_date=table.column('transaction_date').to_pylist(),
+        description=table.column('description').to_pylist(),
+        expense_amount=list(map(Decimal, table.column('expense_amount_text').to_pylist())),
+        income_amount=list(map(Decimal, table.column('income_amount_text').to_pylist())),
+        proof_document=table.column('proof_document').to_pylist(),
+        transaction_category=list(map(TransactionCategory, table.column('transaction_category').to_pylist())))
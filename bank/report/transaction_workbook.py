@@ -0,0 +1,69 @@
+import os
+from enum import Enum
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+from bank.model.transaction_table import TransactionTable
+
+AMOUNT_NUMBER_FORMAT = '#,##0.00'
+DATE_NUMBER_FORMAT = 'yyyy-mm-dd'
+
+# column name -> (number format, width)
+COLUMN_FORMATS = {
+    'bank_nomination': (None, 14),
+    'transaction_date': (DATE_NUMBER_FORMAT, 12),
+    'description': (None, 60),
+    'expense_amount': (AMOUNT_NUMBER_FORMAT, 14),
+    'income_amount': (AMOUNT_NUMBER_FORMAT, 14),
+    'transaction_category': (None, 24),
+    'proof_document': (None, 40),
+}
+
+
+def write_transactions_xlsx(transactions: TransactionTable, xlsx_file: str, sheet_name: str = 'Sheet1'):
+    """
+    Stream the rows of the transaction table columns into a write-only workbook, one row at a time,
+    without building models nor a DataFrame, so that memory stays flat whatever the number of transactions.
+    Decimal amounts are written as numbers and dates as dates, with their number format.
+    Example:
+    >>> write_transactions_xlsx(transactions, 'data/result/all_transactions.xlsx')
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.freeze_panes = 'A2'
+
+    header_font = Font(bold=True)
+    header = []
+    row_cells = []
+    for column_index, column in enumerate(transactions.COLUMNS):
+        number_format, width = COLUMN_FORMATS.get(column, (None, 16))
+        worksheet.column_dimensions[get_column_letter(column_index + 1)].width = width
+        header_cell = WriteOnlyCell(worksheet, value=column)
+        header_cell.font = header_font
+        header.append(header_cell)
+        # formatted cells are reused for every row, write-only cells are serialized when appended
+        if number_format:
+            cell = WriteOnlyCell(worksheet)
+            cell.number_format = number_format
+            row_cells.append(cell)
+        else:
+            row_cells.append(None)
+    worksheet.append(header)
+
+    for row in transactions.iter_rows():
+        values = []
+        for value, cell in zip(row, row_cells):
+            if isinstance(value, Enum):
+                value = str(value)
+            if cell is not None:
+                cell.value = value
+                value = cell
+            values.append(value)
+        worksheet.append(values)
+
+    parent_directory = os.path.dirname(xlsx_file)
+    os.makedirs(parent_directory, exist_ok=True)
+    workbook.save(xlsx_file)
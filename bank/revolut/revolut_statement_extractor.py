@@ -1,44 +1,74 @@
-import csv
-from datetime import datetime
-from decimal import Decimal, InvalidOperation
-from enum import Enum
-from typing import List
+import operator
+from decimal import Decimal
+from typing import TYPE_CHECKING
 
 from bank.generic.bank_statement_extractor import BankStatementExtractor
-from bank.model.transaction import BankStatement, Transaction
+from bank.generic.document_sample import DocumentSample
+from bank.model.transaction import BankStatement
+from bank.model.transaction_table import TransactionTable
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
 
 class RevolutStatementExtractor(BankStatementExtractor):
     BANK_NOMINATION = "Revolut"
-    def _parse_amount(self, amount_str: str) -> Decimal:
-        try:
-            return Decimal(amount_str.replace(',', '.').replace(' ', ''))
-        except InvalidOperation:
-            return Decimal(0)
+    FILE_EXTENSIONS = (".csv",)
+    CSV_COLUMNS = ["Started Date", "Description", "Amount", "Fee"]
+
+    def sniff(self, sample: DocumentSample) -> bool:
+        # header line of the account statement export
+        header = sample.first_line.split(',')
+        return not sample.is_pdf and all(column in header for column in self.CSV_COLUMNS)
+
+    def _parse_amounts(self, amount_col: 'pd.Series') -> tuple['pd.Series', 'np.ndarray']:
+        """
+        Normalize the amount strings of a whole column (e.g. "-1 234,50" -> "-1234.50").
+        Invalid amounts are replaced by "0".
+
+        :return: the normalized amount strings and their float values for sign tests
+        """
+        import pandas as pd
+        amount_col = amount_col.str.replace(',', '.', regex=False).str.replace(' ', '', regex=False)
+        values = pd.to_numeric(amount_col, errors='coerce')
+        amount_col = amount_col.where(values.notna(), '0')
+        return amount_col, values.fillna(0).to_numpy()
 
     def extract_statement(self, csv_path: str) -> BankStatement:
+        import numpy as np
+        import pandas as pd
+
         bank_statement = BankStatement(proof_document=csv_path)
+        df = pd.read_csv(csv_path, usecols=self.CSV_COLUMNS, dtype=str, keep_default_na=False, encoding='utf-8')
+
+        # Parse dates
+        transaction_dates = pd.to_datetime(df["Started Date"], format='ISO8601')
+
+        # Parse amounts, strings are kept to build Decimal values with the same text form as the statement
+        amount_col, amount_values = self._parse_amounts(df["Amount"])
+        fee_col, _ = self._parse_amounts(df["Fee"])
+        income_amounts = list(map(Decimal, np.where(amount_values > 0, amount_col, '0')))
+        # absolute value of negative amounts
+        expense_amounts = list(map(Decimal, np.where(amount_values < 0, amount_col.str.lstrip('-'), '0')))
+        expense_amounts = list(map(operator.add, expense_amounts, map(Decimal, fee_col)))
+
+        transaction_table = TransactionTable.from_columns(
+            bank_nomination=[RevolutStatementExtractor.BANK_NOMINATION] * len(df),
+            transaction_date=transaction_dates.dt.to_pydatetime().tolist(),
+            description=df["Description"].tolist(),
+            expense_amount=expense_amounts,
+            income_amount=income_amounts,
+            proof_document=[csv_path] * len(df),
+        )
+        bank_statement.set_transaction_table(transaction_table)
 
-        with open(csv_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                # Parse dates
-                transaction_date = datetime.fromisoformat(row["Started Date"])
-
-                # Parse amounts and description
-                amount = self._parse_amount(row["Amount"])
-                income_amount = amount if amount > 0 else Decimal(0)
-                expense_amount = abs(amount) if amount < 0 else Decimal(0)
-                fee = self._parse_amount(row["Fee"])
-                expense_amount += fee
-
-                # Create transaction
-                bank_statement.transactions.append(Transaction(
-                    bank_nomination=RevolutStatementExtractor.BANK_NOMINATION,
-                    transaction_date=transaction_date,
-                    description=row["Description"],
-                    expense_amount=expense_amount,
-                    income_amount=income_amount,
-                    proof_document=csv_path
-                ))
-
-        return bank_statement.compute_from_transactions()
\ No newline at end of file
+        # totals and date bounds from the columns
+        bank_statement.total_income = transaction_table.total_income()
+        bank_statement.total_expense = transaction_table.total_expense()
+        bank_statement.final_credit_balance = (bank_statement.initial_credit_balance
+                                               + bank_statement.total_income - bank_statement.total_expense)
+        if len(transaction_table):
+            bank_statement.start_date = transaction_dates.min().to_pydatetime()
+            bank_statement.end_date = transaction_dates.max().to_pydatetime()
+        return bank_statement
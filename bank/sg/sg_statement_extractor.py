@@ -2,18 +2,21 @@ import os
 import re
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from typing import Optional
-
-import pdfplumber
+from typing import Iterator, Optional
 
+from bank.generic import pdf_page_analysis, pdf_words_tables
 from bank.generic.bank_statement_extractor import BankStatementExtractor
-from bank.model.transaction import BankStatement, Transaction
+from bank.generic.document_sample import DocumentSample
+from bank.generic.pdf_layout_template import LayoutTableFinder, LayoutTemplate
+from bank.model.transaction import BankStatement
+from bank.model.transaction_table import TransactionTable
 from const.const_gl import ConstGl
-from util import numeric_parser
+from util import numeric_parser, tracing
 
 
 class SGStatementExtractor(BankStatementExtractor):
     BANK_NOMINATION = "SG"
+    FILE_EXTENSIONS = (".pdf",)
 
     TABLE_COLUMNS_INDEX = {
         "dd_mm_yyy": 0,
@@ -28,13 +31,29 @@ class SGStatementExtractor(BankStatementExtractor):
         "horizontal_strategy": "text", "snap_y_tolerance": 0,
         "intersection_x_tolerance": 15
     }
+    # pattern example: ".... du 09/04/2021 au 06/05/2021 ...."
+    STATEMENT_DATES_PATTERN = r"du (\d{2})/(\d{2})/(\d{4}) au (\d{2})/(\d{2})/(\d{4})"
+
+    # column lines of the transactions table, learned from the first page of each statement when not declared
+    # (print it with: python -m bank.generic.pdf_layout_template <statement.pdf> --bank <bnp|sg>)
+    LAYOUT_TEMPLATE: Optional[LayoutTemplate] = None
+
+    def __init__(self, page_jobs: int = 1, backend: str = pdf_page_analysis.PDFPLUMBER_BACKEND):
+        """
+        :param page_jobs: number of processes extracting the page tables of a statement, useful for long statements
+            (pdfplumber backend only)
+        :param backend: library reading the pages, pdf_page_analysis.PYMUPDF_BACKEND is several times faster
+        """
+        if backend not in pdf_page_analysis.BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {pdf_page_analysis.BACKENDS}")
+        self.page_jobs = page_jobs
+        self.backend = backend
+        self.table_finder = LayoutTableFinder(self.TABLE_SETTINGS, len(self.TABLE_COLUMNS_INDEX), self.LAYOUT_TEMPLATE)
 
     def _extract_start_end_dates(self, text: str) -> tuple[datetime, datetime]:
-        # pattern example: ".... du 09/04/2021 au 06/05/2021 ...."
         start_date = None
         end_date = None
-        pattern_date = r"du (\d{2})/(\d{2})/(\d{4}) au (\d{2})/(\d{2})/(\d{4})"
-        match = re.search(pattern_date, text)
+        match = re.search(self.STATEMENT_DATES_PATTERN, text)
         if match:
             start_date = datetime(int(match.group(3)), int(match.group(2)), int(match.group(1)))
             end_date = datetime(int(match.group(6)), int(match.group(5)), int(match.group(4)))
@@ -49,15 +68,9 @@ class SGStatementExtractor(BankStatementExtractor):
             return numeric_parser.is_decimal(match.group(1))[1]
         return None
 
-    def _extract_final_credit_balance(self, pdf) -> Decimal:
-        # extract the final credit balance from final page
-        for i in range(len(pdf.pages) - 1, -1, -1):
-            page = pdf.pages[i]
-            text = page.extract_text(x_tolerance=2)
-            credit_balance = self._extract_final_credit_balance_from_text(text)
-            if credit_balance:
-                return credit_balance
-        return Decimal(0)
+    def sniff(self, sample: DocumentSample) -> bool:
+        # the statement dates sentence of the first page, as read by _extract_start_end_dates
+        return sample.is_pdf and re.search(self.STATEMENT_DATES_PATTERN, sample.first_page_text) is not None
 
     def _parse_transaction_date(self, date_str) -> Optional[datetime]:
         # transaction date example: 06/05/2021
@@ -70,25 +83,77 @@ class SGStatementExtractor(BankStatementExtractor):
 
     def extract_statement(self, pdf_path: str) -> BankStatement:
         bank_statement = BankStatement(proof_document=pdf_path)
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page_text = pdf.pages[0].extract_text(x_tolerance=2)
-            bank_statement.start_date, bank_statement.end_date = self._extract_start_end_dates(first_page_text)
-            for page in pdf.pages:
-                tables = page.extract_tables(SGStatementExtractor.TABLE_SETTINGS)
-                for table in tables:
-                    if not table or len(table[0]) < len(self.TABLE_COLUMNS_INDEX):
+        transaction_table = TransactionTable()
+        final_credit_balance = Decimal(0)
+        for page_analysis in self._iter_pages_analysis(pdf_path):
+            if page_analysis.page_number == 1:
+                bank_statement.start_date, bank_statement.end_date = \
+                    self._extract_start_end_dates(page_analysis.text)
+            # the final credit balance is on the last page mentioning it, usually the final page
+            credit_balance = self._extract_final_credit_balance_from_text(page_analysis.text or '')
+            if credit_balance:
+                final_credit_balance = credit_balance
+            for table in page_analysis.tables:
+                if not table or len(table[0]) < len(self.TABLE_COLUMNS_INDEX):
+                    continue
+                for row in table:
+                    # if all columns are empty, skip the row
+                    if all(not cell for cell in row):
                         continue
-                    for row in table:
-                        # if all columns are empty, skip the row
-                        if all(not cell for cell in row):
-                            continue
-                        self.process_row(row, bank_statement)
-            # extract the final credit balance from final page
-            bank_statement.final_credit_balance = self._extract_final_credit_balance(pdf)
-
+                    self.process_row(row, bank_statement, transaction_table)
+        if not final_credit_balance:
+            # no page was found mentioning the final credit balance, read the text of every page
+            with tracing.span("extract_final_credit_balance", document=pdf_path):
+                final_credit_balance = self._scan_final_credit_balance(pdf_path)
+        bank_statement.final_credit_balance = final_credit_balance
+
+        bank_statement.set_transaction_table(transaction_table)
         return bank_statement
 
-    def process_row(self, row: list, bank_statement: BankStatement):
+    def _scan_final_credit_balance(self, pdf_path: str) -> Decimal:
+        """Final credit balance from the text of the pages, read from the last one, 0 when not found."""
+        for text in self._iter_pages_text_backward(pdf_path):
+            credit_balance = self._extract_final_credit_balance_from_text(text)
+            if credit_balance:
+                return credit_balance
+        return Decimal(0)
+
+    def _iter_pages_text_backward(self, pdf_path: str) -> Iterator[str]:
+        if self.backend == pdf_page_analysis.PYMUPDF_BACKEND:
+            import fitz  # PyMuPDF
+            with fitz.open(pdf_path) as pdf:
+                for page_index in range(pdf.page_count - 1, -1, -1):
+                    yield pdf_words_tables.page_text(pdf[page_index].get_text("words"))
+        else:
+            import pdfplumber
+            with pdfplumber.open(pdf_path) as pdf:
+                for page in reversed(pdf.pages):
+                    yield page.extract_text(x_tolerance=2)
+
+    def _iter_pages_analysis(self, pdf_path: str) -> Iterator[pdf_page_analysis.PageAnalysis]:
+        self.table_finder.start_document()
+        if self.backend == pdf_page_analysis.PYMUPDF_BACKEND:
+            return pdf_words_tables.iter_pages_analysis(pdf_path, self._analyse_words_page)
+        return pdf_page_analysis.iter_pages_analysis(pdf_path, self._analyse_page, self.page_jobs)
+
+    def _analyse_page(self, page) -> pdf_page_analysis.PageAnalysis:
+        tables = self.table_finder.extract_tables(page)
+        # text is needed for the statement dates of the first page and the final credit balance
+        text = None
+        if page.page_number == 1 or pdf_page_analysis.page_contains(page, 'NOUVEAU SOLDE'):
+            text = page.extract_text(x_tolerance=2)
+        return pdf_page_analysis.PageAnalysis(page.page_number, tables, text)
+
+    def _analyse_words_page(self, page) -> pdf_page_analysis.PageAnalysis:
+        # same analysis as _analyse_page, from the PyMuPDF words of the page
+        words = page.get_text("words")
+        tables = pdf_words_tables.extract_tables(page, words)
+        text = None
+        if page.number == 0 or pdf_words_tables.page_contains(words, 'NOUVEAU SOLDE'):
+            text = pdf_words_tables.page_text(words)
+        return pdf_page_analysis.PageAnalysis(page.number + 1, tables, text)
+
+    def process_row(self, row: list, bank_statement: BankStatement, transaction_table: TransactionTable):
         transaction_date_str = row[self.TABLE_COLUMNS_INDEX["dd_mm_yyy"]]
         transaction_date = self._parse_transaction_date(transaction_date_str)
 
@@ -108,16 +173,10 @@ class SGStatementExtractor(BankStatementExtractor):
             bank_statement.total_expense = expense_amount
             bank_statement.total_income = incoming_amount
         elif is_incoming or is_outgoing:
-            bank_statement.transactions.append(Transaction(
-                bank_nomination=self.BANK_NOMINATION,
-                transaction_date=transaction_date,
-                description=description,
-                expense_amount=expense_amount,
-                income_amount=incoming_amount,
-                proof_document=bank_statement.proof_document
-            ))
+            transaction_table.append(self.BANK_NOMINATION, transaction_date, description,
+                                     expense_amount, incoming_amount, bank_statement.proof_document)
         elif description:
-            bank_statement.transactions[-1].description += description
+            transaction_table.append_to_last_description(description)
 
 
 def main():
@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Optional
+
+from bank.generic.transaction_categorizer import TransactionCategorizer
+from bank.model.transaction_category import TransactionCategory
+
+
+def generate_vocabulary(size: int, rnd: random.Random) -> list[str]:
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return [''.join(rnd.choice(letters) for _ in range(rnd.randint(3, 9))) for _ in range(size)]
+
+
+def generate_rules(count: int, vocabulary: list[str], rnd: random.Random) -> dict[str, TransactionCategory]:
+    categories = list(TransactionCategory)
+    rules = {}
+    while len(rules) < count:
+        key = ' '.join(rnd.sample(vocabulary, rnd.randint(1, 3)))
+        rules[key] = rnd.choice(categories)
+    return rules
+
+
+def generate_descriptions(count: int, vocabulary: list[str], rules: list[str], rnd: random.Random) -> list[str]:
+    descriptions = []
+    for i in range(count):
+        words = rnd.sample(vocabulary, rnd.randint(3, 8))
+        # half of the descriptions contain a rule key, like card payments to known merchants
+        if i % 2 == 0:
+            words += rnd.choice(rules).split()
+            rnd.shuffle(words)
+        descriptions.append('PAIEMENT CB ' + ' '.join(words).lower())
+    return descriptions
+
+
+def linear_search_category(normalized_category_map: dict[str, TransactionCategory],
+                           description: str) -> Optional[TransactionCategory]:
+    """Former implementation of TransactionCategorizer.search_category, scanning every rule."""
+    description_split_set = set(description.upper().split())
+    for key, value in normalized_category_map.items():
+        if all(part in description_split_set for part in key.split()):
+            return value
+    return None
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark TransactionCategorizer rule search")
+    parser.add_argument("--rules", type=int, default=10_000)
+    parser.add_argument("--descriptions", type=int, default=100_000)
+    parser.add_argument("--linear-sample", type=int, default=2_000,
+                        help="number of descriptions timed with the linear scan, extrapolated to all descriptions")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    vocabulary = generate_vocabulary(20_000, rnd)
+    rules = generate_rules(args.rules, vocabulary, rnd)
+    descriptions = generate_descriptions(args.descriptions, vocabulary, list(rules), rnd)
+
+    categorizer = TransactionCategorizer(os.path.join(tempfile.mkdtemp(), "user_category_map.json"))
+    categorizer.category_map.clear()
+    categorizer.category_map.update(rules)
+    start = time.perf_counter()
+    categorizer.compute_normalized_map()
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed_results = [categorizer.search_description_category(description) for description in descriptions]
+    indexed_time = time.perf_counter() - start
+
+    sample = descriptions[:args.linear_sample]
+    start = time.perf_counter()
+    linear_results = [linear_search_category(categorizer._normalized_category_map, description)
+                      for description in sample]
+    linear_time = (time.perf_counter() - start) * len(descriptions) / len(sample)
+
+    assert linear_results == indexed_results[:len(sample)], "indexed search differs from linear scan"
+    matched = sum(1 for result in indexed_results if result)
+    print(f"{args.rules} rules x {args.descriptions} descriptions ({matched} matched)")
+    print(f"index build:   {index_time * 1000:10.1f} ms")
+    print(f"indexed search: {indexed_time:9.2f} s")
+    print(f"linear search: {linear_time:10.2f} s (extrapolated from {len(sample)} descriptions)")
+    print(f"speedup:       {linear_time / indexed_time:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Parity check of the PyMuPDF backend of the BNP and SG extractors against the pdfplumber one:
+every statement must give exactly the same BankStatement with both backends. Also prints the time of each backend.
+Run it on synthetic statements, or on a directory of real ones before switching a bank to the fast backend.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from bank.bnp.bnp_hello_statement_extractor import BNPHelloStatementExtractor
+from bank.bnp.bnp_statement_extractor import BNPStatementExtractor
+from bank.generic import pdf_page_analysis
+from bank.model.transaction import BankStatement
+from bank.sg.sg_statement_extractor import SGStatementExtractor
+from benchmark import synthetic_statements
+
+EXTRACTOR_CLASSES = {"bnp": BNPStatementExtractor, "hello_bank": BNPHelloStatementExtractor,
+                     "sg": SGStatementExtractor}
+
+
+def first_difference(expected: BankStatement, actual: BankStatement) -> str:
+    """Description of the first field, or transaction, differing between two statements."""
+    expected_fields, actual_fields = expected.model_dump(), actual.model_dump()
+    for field, expected_value in expected_fields.items():
+        if field == "transactions":
+            continue
+        if actual_fields[field] != expected_value:
+            return f"{field}: {expected_value!r} != {actual_fields[field]!r}"
+    for index, (expected_transaction, actual_transaction) in enumerate(zip(expected_fields["transactions"],
+                                                                           actual_fields["transactions"])):
+        if actual_transaction != expected_transaction:
+            return f"transaction {index}: {expected_transaction} != {actual_transaction}"
+    return f"transactions count: {len(expected.transaction_table)} != {len(actual.transaction_table)}"
+
+
+def check_parity(bank: str, pdf_paths: list[str]) -> tuple[list[str], dict[str, float]]:
+    """
+    Extract the statements with both backends.
+
+    :return: the mismatches, and the extraction time in seconds of each backend
+    """
+    mismatches = []
+    seconds = dict.fromkeys(pdf_page_analysis.BACKENDS, 0.0)
+    extractors = {backend: EXTRACTOR_CLASSES[bank](backend=backend) for backend in pdf_page_analysis.BACKENDS}
+    for pdf_path in pdf_paths:
+        bank_statements = {}
+        for backend, extractor in extractors.items():
+            start = time.perf_counter()
+            bank_statements[backend] = extractor.extract_statement(pdf_path)
+            seconds[backend] += time.perf_counter() - start
+        expected = bank_statements[pdf_page_analysis.PDFPLUMBER_BACKEND]
+        actual = bank_statements[pdf_page_analysis.PYMUPDF_BACKEND]
+        if actual.model_dump_json() != expected.model_dump_json():
+            mismatches.append(f"{pdf_path}: {first_difference(expected, actual)}")
+    return mismatches, seconds
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Check the PyMuPDF backend gives the same statements as pdfplumber")
+    parser.add_argument("--bank", choices=list(EXTRACTOR_CLASSES), action="append",
+                        help="bank of the statements, repeat for several banks (default: all)")
+    parser.add_argument("--dir", help="directory of real statements of the bank, instead of synthetic ones")
+    parser.add_argument("--statements", type=int, default=3, help="number of synthetic statements per bank")
+    parser.add_argument("--transactions", type=int, default=200, help="number of transactions per synthetic statement")
+    args = parser.parse_args(argv)
+    banks = args.bank or list(EXTRACTOR_CLASSES)
+    if args.dir and len(banks) != 1:
+        parser.error("--dir needs a single --bank")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.dir:
+            directories = {banks[0]: args.dir}
+        else:
+            directories = synthetic_statements.generate_data(work_dir, args.statements, args.transactions,
+                                                             revolut_transactions=0, trips=0)
+        all_mismatches = []
+        print(f"{'bank':12} {'statements':>10} {'pdfplumber s':>13} {'pymupdf s':>10} {'speedup':>8}")
+        for bank in banks:
+            pdf_paths = [os.path.join(directories[bank], filename)
+                         for filename in sorted(os.listdir(directories[bank])) if filename.lower().endswith(".pdf")]
+            mismatches, seconds = check_parity(bank, pdf_paths)
+            all_mismatches += mismatches
+            pdfplumber_seconds = seconds[pdf_page_analysis.PDFPLUMBER_BACKEND]
+            pymupdf_seconds = seconds[pdf_page_analysis.PYMUPDF_BACKEND]
+            print(f"{bank:12} {len(pdf_paths):10} {pdfplumber_seconds:13.3f} {pymupdf_seconds:10.3f} "
+                  f"{pdfplumber_seconds / pymupdf_seconds if pymupdf_seconds else 0:8.1f}")
+
+    if all_mismatches:
+        print("\nMismatches:")
+        for mismatch in all_mismatches:
+            print(f"  {mismatch}")
+        sys.exit(1)
+    print("\nSame statements with both backends")
+
+
+if __name__ == '__main__':
+    main()
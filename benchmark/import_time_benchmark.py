@@ -0,0 +1,100 @@
+"""
+Cold start guard of the entry points: each one is imported by a fresh interpreter with `python -X importtime`,
+its import time is checked against its budget and the heavy libraries it must only load in the code paths
+using them (e.g. pandas on a bank run without new statement) are checked not to be imported.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# libraries imported by the functions using them, never when an entry point is imported
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'openpyxl', 'pdfplumber', 'fitz', 'pymupdf', 'fpdf', 'tqdm')
+
+# import time budget of each entry point, in milliseconds
+ENTRY_POINT_BUDGETS_MS = {
+    'bank.bank_calculator': 250,
+    'frais.frais_calculator': 250,
+    'watch.watch_daemon': 300,
+}
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """
+    Cumulative import time, in microseconds, of each module imported, from the `-X importtime` report.
+    Example:
+    >>> parse_importtime('import time: self [us] | cumulative | imported package\\nimport time: 120 | 350 |   json')
+    {'json': 350}
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def measure_import(module: str, repeat: int) -> dict:
+    """
+    Import time of a module by a fresh interpreter, best of `repeat` runs, and the modules it imports.
+
+    :return: {"milliseconds": ..., "modules": {module name: cumulative microseconds}}
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])))
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                   cwd=REPO_DIR, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Import of {module} failed:\n{completed.stderr}")
+        modules = parse_importtime(completed.stderr)
+        if best is None or modules[module] < best[module]:
+            best = modules
+    return {"milliseconds": best[module] / 1000, "modules": best}
+
+
+def heaviest_imports(modules: dict[str, int], entry_point: str, count: int) -> list[tuple[str, int]]:
+    """Third party and standard library packages (not the repo modules) taking the most time to import."""
+    repo_packages = {entry.name for entry in os.scandir(REPO_DIR) if entry.is_dir()}
+    packages = [(name, cumulative) for name, cumulative in modules.items()
+                if '.' not in name and name != entry_point and name not in repo_packages]
+    return sorted(packages, key=lambda package: -package[1])[:count]
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Check the import time of each entry point against its budget")
+    parser.add_argument("--module", action="append", choices=list(ENTRY_POINT_BUDGETS_MS),
+                        help="entry point to check, all of them by default")
+    parser.add_argument("--repeat", type=int, default=5, help="each import time is the best of this number of runs")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="factor applied to every budget, e.g. 2 on a machine twice as slow")
+    parser.add_argument("--top", type=int, default=5, help="number of heaviest imported packages printed")
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'entry point':25} {'import ms':>10} {'budget ms':>10}")
+    for entry_point in args.module or ENTRY_POINT_BUDGETS_MS:
+        budget = ENTRY_POINT_BUDGETS_MS[entry_point] * args.budget_scale
+        result = measure_import(entry_point, args.repeat)
+        heavy_modules = [module for module in HEAVY_MODULES if module in result["modules"]]
+        is_over_budget = result["milliseconds"] > budget
+        print(f"{entry_point:25} {result['milliseconds']:10.1f} {budget:10.1f}"
+              f"{'  OVER BUDGET' if is_over_budget else ''}")
+        for name, cumulative in heaviest_imports(result["modules"], entry_point, args.top):
+            print(f"    {name:21} {cumulative / 1000:10.1f}")
+        if is_over_budget:
+            failures.append(f"{entry_point} imports in {result['milliseconds']:.1f} ms, budget {budget:.1f} ms")
+        if heavy_modules:
+            failures.append(f"{entry_point} imports {', '.join(heavy_modules)}")
+
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+from bank.bnp.bnp_hello_statement_extractor import BNPHelloStatementExtractor
+from bank.bnp.bnp_statement_extractor import BNPStatementExtractor
+from bank.generic.bank_statement_extractor import BankStatementExtractor
+from bank.generic.extractor_registry import ExtractorRegistry
+from bank.generic.transaction_categorizer import TransactionCategorizer
+from bank.model.transaction_table import TransactionTable
+from bank.report import transaction_workbook
+from bank.revolut.revolut_statement_extractor import RevolutStatementExtractor
+from bank.sg.sg_statement_extractor import SGStatementExtractor
+from benchmark import synthetic_statements
+from frais.frais_calculator import extract_trip_frais_details
+from frais.sncf.trip_achat_extractor import TripAchatExtractor
+from frais.sncf.trip_voyage_extractor import TripVoyageExtractor
+from util import pdf_merger
+from util.result_file_cache import ResultFileCache
+
+
+def measure(function: Callable[[], int], repeat: int, trace_memory: bool) -> dict:
+    """
+    Time a stage, best of `repeat` runs, then run it once more under tracemalloc for its peak memory.
+
+    :param function: the stage, returning the number of items it processed
+    """
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = function()
+        seconds = min(seconds, time.perf_counter() - start)
+    result = {"seconds": seconds, "items": items, "items_per_second": items / seconds if seconds else 0.0}
+    if trace_memory:
+        # separate run: tracing allocations slows the stage down
+        tracemalloc.start()
+        function()
+        result["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return result
+
+
+def extract_statements(directory: str, extractor: BankStatementExtractor) -> TransactionTable:
+    transactions = TransactionTable()
+    for filename in sorted(os.listdir(directory)):
+        bank_statement = extractor.extract_and_validate(os.path.join(directory, filename))
+        transactions.extend(bank_statement.transaction_table)
+    return transactions
+
+
+def run_benchmark(directories: dict[str, str], work_dir: str, repeat: int, trace_memory: bool) -> dict[str, dict]:
+    """Time each stage of the bank and frais pipelines on the generated data, in pipeline order."""
+    all_files = [os.path.join(directory, filename)
+                 for directory in directories.values() for filename in sorted(os.listdir(directory))]
+    trip_files = [os.path.join(directories["sncf"], filename) for filename in sorted(os.listdir(directories["sncf"]))]
+    stages = {}
+
+    def hash_cold() -> int:
+        # a new cache database: every file is read and hashed
+        with tempfile.TemporaryDirectory(dir=work_dir) as cache_dir:
+            result_cache = ResultFileCache(os.path.join(cache_dir, 'result_cache.sqlite'))
+            for file in all_files:
+                result_cache.compute_hash(file)
+            result_cache.close()
+        return len(all_files)
+
+    warm_cache = ResultFileCache(os.path.join(work_dir, 'warm_cache.sqlite'))
+
+    def hash_warm() -> int:
+        # hashes found by path and file metadata, files are not read
+        for file in all_files:
+            warm_cache.compute_hash(file)
+        return len(all_files)
+
+    stages["hashing_cold"] = measure(hash_cold, repeat, trace_memory)
+    hash_warm()
+    stages["hashing_warm"] = measure(hash_warm, repeat, trace_memory)
+    warm_cache.close()
+
+    def route_inbox() -> int:
+        # every document sniffed as if dropped in the inbox, the SNCF proofs are recognized by no extractor
+        registry = ExtractorRegistry([BNPHelloStatementExtractor(), BNPStatementExtractor(), SGStatementExtractor(),
+                                      RevolutStatementExtractor()])
+        for file in all_files:
+            registry.find_extractor(file)
+        return len(all_files)
+
+    stages["inbox_routing"] = measure(route_inbox, repeat, trace_memory)
+
+    bank_transactions: dict[str, TransactionTable] = {}
+    for bank, extractor in [("bnp", BNPStatementExtractor()), ("hello_bank", BNPHelloStatementExtractor()),
+                            ("revolut", RevolutStatementExtractor()), ("sg", SGStatementExtractor())]:
+        def extract_bank(bank=bank, extractor=extractor) -> int:
+            bank_transactions[bank] = extract_statements(directories[bank], extractor)
+            return len(bank_transactions[bank])
+
+        stages[f"extraction_{bank}"] = measure(extract_bank, repeat, trace_memory)
+    all_transactions = TransactionTable()
+    for transactions in bank_transactions.values():
+        all_transactions.extend(transactions)
+
+    trip_extractors = [TripVoyageExtractor(), TripAchatExtractor()]
+    stages["extraction_sncf"] = measure(
+        lambda: len([extract_trip_frais_details(file, trip_extractors) for file in trip_files]), repeat, trace_memory)
+
+    categorizer = TransactionCategorizer(os.path.join(work_dir, "user_category_map.json"))
+    df = all_transactions.to_frame()
+
+    def categorize() -> int:
+        categorizer.categorize_frame(df.copy())
+        return len(df)
+
+    stages["categorization"] = measure(categorize, repeat, trace_memory)
+
+    xlsx_file = os.path.join(work_dir, "all_transactions.xlsx")
+    stages["excel_export"] = measure(
+        lambda: transaction_workbook.write_transactions_xlsx(all_transactions, xlsx_file) or len(all_transactions),
+        repeat, trace_memory)
+
+    proofs_cache = ResultFileCache(os.path.join(work_dir, 'proofs_cache.sqlite'))
+    pdf_merger.predict_starting_page(trip_files, result_cache=proofs_cache)
+    # page counts of the proofs already seen by a previous run
+    stages["proof_page_counts"] = measure(
+        lambda: len(pdf_merger.predict_starting_page(trip_files, result_cache=proofs_cache)[0]), repeat, trace_memory)
+    proofs_cache.close()
+
+    merged_pdf = os.path.join(work_dir, "aio_merged.pdf")
+
+    def merge_frais() -> int:
+        pdf_merger.merge_pdfs_with_bookmarks(trip_files, merged_pdf, number_pages=True)
+        return len(trip_files)
+
+    stages["frais_merge"] = measure(merge_frais, repeat, trace_memory)
+    return stages
+
+
+def compare_with_baseline(stages: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """Print each stage time against the baseline and return the stages slower by more than tolerance."""
+    regressions = []
+    print(f"{'stage':22} {'baseline s':>11} {'current s':>11} {'ratio':>7}")
+    for name, result in stages.items():
+        if name not in baseline:
+            print(f"{name:22} {'-':>11} {result['seconds']:11.4f}")
+            continue
+        ratio = result["seconds"] / baseline[name]["seconds"]
+        is_regression = ratio > 1 + tolerance
+        if is_regression:
+            regressions.append(name)
+        print(f"{name:22} {baseline[name]['seconds']:11.4f} {result['seconds']:11.4f} {ratio:7.2f}"
+              f"{'  REGRESSION' if is_regression else ''}")
+    return regressions
+
+
+def print_stages(stages: dict[str, dict]):
+    print(f"{'stage':22} {'seconds':>10} {'items':>8} {'items/s':>12} {'peak MB':>9}")
+    for name, result in stages.items():
+        peak_memory = f"{result['peak_memory_mb']:9.1f}" if "peak_memory_mb" in result else f"{'-':>9}"
+        print(f"{name:22} {result['seconds']:10.4f} {result['items']:8} {result['items_per_second']:12.1f} "
+              f"{peak_memory}")
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the pipelines on synthetic documents")
+    parser.add_argument("--statements", type=int, default=3, help="number of BNP, Hello Bank and SG statements each")
+    parser.add_argument("--transactions", type=int, default=60, help="number of transactions per PDF statement")
+    parser.add_argument("--revolut-transactions", type=int, default=2000)
+    parser.add_argument("--trips", type=int, default=20, help="number of SNCF proof documents")
+    parser.add_argument("--repeat", type=int, default=3, help="each stage time is the best of this number of runs")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run measuring peak memory")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with this JSON baseline, exit code 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown of a stage above which it is reported as a regression")
+    args = parser.parse_args(argv)
+
+    parameters = {"statements": args.statements, "transactions": args.transactions,
+                  "revolut_transactions": args.revolut_transactions, "trips": args.trips}
+    with tempfile.TemporaryDirectory() as work_dir:
+        directories = synthetic_statements.generate_data(os.path.join(work_dir, "data"), args.statements,
+                                                         args.transactions, args.revolut_transactions, args.trips)
+        stages = run_benchmark(directories, work_dir, args.repeat, not args.no_memory)
+    print_stages(stages)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"parameters": parameters, "stages": stages}, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if baseline["parameters"] != parameters:
+            print(f"Warning: baseline parameters {baseline['parameters']} differ from {parameters}")
+        regressions = compare_with_baseline(stages, baseline["stages"], args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
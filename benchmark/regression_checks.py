@@ -0,0 +1,162 @@
+"""
+Behaviour checks of the bank and frais pipelines on small synthetic inputs: each check prints its result
+and the script exits with code 1 when one of them fails.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator, Optional
+from unittest import mock
+
+from bank import bank_calculator
+from bank.generic import pdf_page_analysis
+from bank.generic.transaction_categorizer import TransactionCategorizer
+from bank.model.transaction_category import TransactionCategory
+from bank.model.transaction_table import TransactionTable
+from bank.report import transaction_dataset
+from benchmark import synthetic_statements
+from const.const_gl import ConstGl, setup_dirs
+from util import run_manifest, tracing
+from util.result_file_cache import ResultFileCache
+
+# answers of the category prompt: the number of GROCERIES, then the default key, the description
+GROCERIES_ANSWERS = [str(list(TransactionCategory).index(TransactionCategory.GROCERIES) + 1), '']
+
+
+@contextlib.contextmanager
+def data_dir(work_dir: str) -> Iterator[None]:
+    """Data folders of ConstGl moved to the work directory while the check runs."""
+    original_root = ConstGl.PATH_TO_DATA
+    names = [name for name in dir(ConstGl) if name.startswith('PATH_TO') or name == 'TEMP_DIR']
+    original_values = {name: getattr(ConstGl, name) for name in names}
+    for name, value in original_values.items():
+        setattr(ConstGl, name, value.replace(original_root, os.path.join(work_dir, 'data'), 1))
+    try:
+        setup_dirs()
+        yield
+    finally:
+        for name, value in original_values.items():
+            setattr(ConstGl, name, value)
+
+
+def check_prompted_rule_categorizes_later_rows(work_dir: str) -> Optional[str]:
+    """
+    A rule added while answering the prompt of a transaction also categorizes the later transactions
+    of the same label that were not asked about (below the amount to ask).
+
+    :return: the failure, None when the check passes
+    """
+    transactions = TransactionTable()
+    transactions.append('BNP', datetime(2024, 1, 5), 'ZZQX MARKET 42', Decimal('60000'), Decimal(0), 'a.pdf')
+    transactions.append('BNP', datetime(2024, 1, 6), 'ZZQX MARKET 42', Decimal('12.5'), Decimal(0), 'a.pdf')
+    categorizer = TransactionCategorizer(os.path.join(work_dir, 'user_category_map.json'))
+    with mock.patch('builtins.input', side_effect=GROCERIES_ANSWERS):
+        bank_calculator.categorize_transactions(transactions, categorizer)
+    expected = [TransactionCategory.GROCERIES, TransactionCategory.GROCERIES]
+    if transactions.transaction_category != expected:
+        return f"categories {transactions.transaction_category} != {expected}"
+    return None
+
+
+def check_unattended_run_leaves_statements_to_categorize(work_dir: str) -> Optional[str]:
+    """
+    A statement added by an unattended run (the watch daemon) with transactions left without category
+    is not recorded as up to date: the next interactive run asks about them, without duplicating its rows.
+
+    :return: the failure, None when the check passes
+    """
+    with data_dir(work_dir):
+        with open(os.path.join(ConstGl.PATH_TO_BANK_DATA_REVOLUT, 'account_statement.csv'), 'w') as f:
+            f.write("Started Date,Description,Amount,Fee\n"
+                    "2024-01-05 10:00:00,Zzqx Market 42,-60000.00,0.00\n"
+                    "2024-01-06 10:00:00,Zzqx Market 42,-12.50,0.00\n")
+        result_cache = ResultFileCache(os.path.join(work_dir, 'result_cache.sqlite'))
+        categorizer = TransactionCategorizer(os.path.join(work_dir, 'user_category_map.json'))
+        banks_path_tuples = bank_calculator.get_banks_path_tuples(result_cache=result_cache)
+        try:
+            with mock.patch('builtins.input', side_effect=EOFError("the daemon must not prompt")):
+                bank_calculator.update_outputs(banks_path_tuples, result_cache, categorizer, interactive=False)
+            saved_manifest = run_manifest.load_run_manifest(ConstGl.PATH_TO_BANK_RUN_MANIFEST)
+            if any(file_hash is not None for file_hash in saved_manifest.values()):
+                return f"statement to categorize recorded as up to date: {saved_manifest}"
+            with mock.patch('builtins.input', side_effect=GROCERIES_ANSWERS) as prompt:
+                bank_calculator.update_outputs(banks_path_tuples, result_cache, categorizer)
+            if not prompt.called:
+                return "the interactive run did not ask about the statement"
+        finally:
+            result_cache.close()
+        categories = transaction_dataset.read_transactions_table().transaction_category
+        expected = [TransactionCategory.GROCERIES, TransactionCategory.GROCERIES]
+        if categories != expected:
+            return f"categories {categories} != {expected}"
+    return None
+
+
+def check_page_jobs_trace_has_page_spans(work_dir: str) -> Optional[str]:
+    """
+    With --page-jobs 2, the pages of a long statement analysed by the page worker processes
+    have their spans in the trace of the run.
+    Tracing stays enabled for the checks run after this one.
+
+    :return: the failure, None when the check passes
+    """
+    with data_dir(work_dir):
+        pdf_path = synthetic_statements.generate_bnp_statement(
+            os.path.join(ConstGl.PATH_TO_BANK_DATA_BNP, 'RLV_CHQ_LONG.pdf'), 600)
+        result_cache = ResultFileCache(os.path.join(work_dir, 'result_cache.sqlite'))
+        categorizer = TransactionCategorizer(os.path.join(work_dir, 'user_category_map.json'))
+        tracing.enable()
+        try:
+            banks_path_tuples = bank_calculator.get_banks_path_tuples(page_jobs=2, result_cache=result_cache)
+            bank_calculator.update_outputs(banks_path_tuples, result_cache, categorizer)
+        finally:
+            result_cache.close()
+        trace_file = os.path.join(work_dir, 'trace.json')
+        tracing.write_chrome_trace(trace_file)
+    with open(trace_file) as f:
+        events = json.load(f)['traceEvents']
+    page_spans = [event for event in events
+                  if event['name'] == 'analyse_page' and event['args'].get('document') == pdf_path
+                  and 'page' in event['args']]
+    if not page_spans:
+        return "no analyse_page span of the statement pages in the trace"
+    if all(event['pid'] == os.getpid() for event in page_spans):
+        return "the pages were not analysed by page worker processes"
+    page_count = max(event['args']['page'] for event in page_spans)
+    if page_count < pdf_page_analysis.MIN_PAGES_FOR_PARALLEL or len(page_spans) != page_count:
+        return f"{len(page_spans)} analyse_page spans for {page_count} pages"
+    return None
+
+
+CHECKS = {
+    "prompted_rule_categorizes_later_rows": check_prompted_rule_categorizes_later_rows,
+    "unattended_run_leaves_statements_to_categorize": check_unattended_run_leaves_statements_to_categorize,
+    # last, it enables tracing
+    "page_jobs_trace_has_page_spans": check_page_jobs_trace_has_page_spans,
+}
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Check the behaviour of the pipelines on synthetic inputs")
+    parser.add_argument("--check", action="append", choices=list(CHECKS), help="check to run, all of them by default")
+    args = parser.parse_args(argv)
+
+    failures = []
+    for name in args.check or CHECKS:
+        with tempfile.TemporaryDirectory() as work_dir:
+            failure = CHECKS[name](work_dir)
+        print(f"{name:50} {'FAILED: ' + failure if failure else 'ok'}")
+        if failure:
+            failures.append(name)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Synthetic documents, laid out like the real ones closely enough for the extractors to parse them,
+real statements can't be committed nor shared.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fpdf import FPDF
+
+FRENCH_MONTHS = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août",
+                 "septembre", "octobre", "novembre", "décembre"]
+MERCHANTS = ["LIDL PARIS 11", "CARREFOUR CITY", "SNCF INTERNET", "UBER TRIP", "AMAZON PAYMENTS", "PHARMACIE DU CENTRE",
+             "EDF CLIENTS", "FNAC DARTY", "BOULANGERIE MARIE", "RESTAURANT LE PETIT", "ORANGE SA", "DECATHLON"]
+# the euro sign of the WinAnsi encoding used by the fpdf core fonts
+EURO = chr(128)
+ROWS_PER_PAGE = 28
+ROW_HEIGHT = 6
+
+
+def format_bnp_amount(amount: Decimal) -> str:
+    # example: 1 234,56
+    return f"{amount:,.2f}".replace(",", " ").replace(".", ",")
+
+
+def format_sg_amount(amount: Decimal) -> str:
+    # example: 1.234,56
+    return f"{amount:,.2f}".replace(",", " ").replace(".", ",").replace(" ", ".")
+
+
+def random_transactions(count: int, start_date: datetime, days: int, rnd: random.Random) -> list[tuple]:
+    """
+    Sorted (date, description, expense, income) tuples, one income every ten transactions.
+    Incomes are spread evenly so that every statement page has some: a credit column without any amount
+    on a page is not detected as a table column.
+    """
+    dates = sorted(start_date + timedelta(days=rnd.randrange(days)) for _ in range(count))
+    transactions = []
+    for i, date in enumerate(dates):
+        amount = Decimal(rnd.randrange(100, 20000)) / 100
+        if i % 10 == 0:
+            transactions.append((date, "VIR SEPA RECU SALAIRE", Decimal(0), amount * 10))
+        else:
+            transactions.append((date, f"FACTURE CARTE {rnd.choice(MERCHANTS)}", amount, Decimal(0)))
+    return transactions
+
+
+def _draw_table_page(pdf: FPDF, widths: list[float], rows: list[list[str]], top: float):
+    """
+    Rows of text between vertical lines, as detected with vertical_strategy lines / horizontal_strategy text.
+    Amounts (the last two columns) are right aligned so that the text rows reach the last line.
+    """
+    x = pdf.l_margin
+    bottom = top + ROW_HEIGHT * len(rows)
+    for width in [0] + widths:
+        x += width
+        pdf.line(x, top, x, bottom)
+    pdf.set_xy(pdf.l_margin, top)
+    for row in rows:
+        for column, (width, cell) in enumerate(zip(widths, row)):
+            pdf.cell(width, ROW_HEIGHT, cell, align="R" if column >= len(widths) - 2 else "")
+        pdf.ln(ROW_HEIGHT)
+
+
+LEGAL_TEXT = ("Les opérations de votre compte sont régies par les conditions générales de la convention de compte. "
+              "En cas de réclamation, adressez-vous à votre conseiller ou au service relations clients. "
+              "Le médiateur peut être saisi gratuitement par écrit. Garantie des dépôts dans la limite de 100 000 euros "
+              "par déposant. Conservez ce relevé, il ne vous sera pas délivré de duplicata. ") * 3
+
+
+def _add_page(pdf: FPDF, bank_name: str, page_number: int):
+    """New page with the address block and the legal footer printed around the table on real statements."""
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=7)
+    for line in [bank_name, "AGENCE PARIS REPUBLIQUE", "12 PLACE DE LA REPUBLIQUE 75011 PARIS",
+                 f"M. THIERRY LASTNAME - Compte n° 0001234567890 - page {page_number}"]:
+        pdf.cell(0, 4, line)
+        pdf.ln(4)
+    pdf.set_xy(pdf.l_margin, 250)
+    pdf.multi_cell(0, 3, LEGAL_TEXT)
+    pdf.set_xy(pdf.l_margin, 30)
+    pdf.set_font("Helvetica", size=8)
+
+
+def _table_pages(rows: list[list[str]]) -> list[list[list[str]]]:
+    return [rows[i:i + ROWS_PER_PAGE] for i in range(0, len(rows), ROWS_PER_PAGE)] or [[]]
+
+
+def generate_bnp_statement(pdf_path: str, transaction_count: int, seed: int = 0, bank_name: str = "BNP PARIBAS") -> str:
+    """
+    BNP / Hello Bank statement: 'du 6 janvier 2024 au 6 février 2024', dates as dd.mm, amounts as 1 234,56.
+
+    :param bank_name: printed in the page headers, "HELLO BANK!" for a Hello Bank statement
+    """
+    rnd = random.Random(seed)
+    start_date = datetime(2024, 1, 6) + timedelta(days=31 * (seed % 12))
+    end_date = start_date + timedelta(days=30)
+    transactions = random_transactions(transaction_count, start_date, 30, rnd)
+    initial_balance = Decimal(rnd.randrange(100000, 500000)) / 100
+    total_expense = sum((transaction[2] for transaction in transactions), Decimal(0))
+    total_income = sum((transaction[3] for transaction in transactions), Decimal(0))
+    final_balance = initial_balance + total_income - total_expense
+
+    rows = [["", f"SOLDE CREDITEUR AU {start_date:%d.%m.%Y}", "", "", format_bnp_amount(initial_balance)]]
+    for date, description, expense, income in transactions:
+        rows.append([f"{date:%d.%m}", description, f"{date:%d.%m}",
+                     format_bnp_amount(expense) if expense else "", format_bnp_amount(income) if income else ""])
+        if rnd.random() < 0.2:
+            # continuation of the description on the next line
+            rows.append(["", f" REF {rnd.randrange(10 ** 8):08d}", "", "", ""])
+    rows.append(["TOTAL DES OPERATIONS", "", "", format_bnp_amount(total_expense), format_bnp_amount(total_income)])
+    rows.append([f"SOLDE CREDITEUR AU {end_date:%d.%m.%Y}", "", "", "", format_bnp_amount(final_balance)])
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+    widths = [60, 65, 18, 23, 24]
+    for page_index, page_rows in enumerate(_table_pages(rows)):
+        _add_page(pdf, bank_name, page_index + 1)
+        if page_index == 0:
+            pdf.cell(0, 8, f"RELEVE DE COMPTE CHEQUES du {start_date.day} {FRENCH_MONTHS[start_date.month - 1]} "
+                           f"{start_date.year} au {end_date.day} {FRENCH_MONTHS[end_date.month - 1]} {end_date.year}")
+            pdf.ln(12)
+        _draw_table_page(pdf, widths, [["Date", "Nature des opérations", "Valeur", "Débit", "Crédit"]] + page_rows,
+                         pdf.get_y())
+    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+    pdf.output(pdf_path)
+    return pdf_path
+
+
+def generate_sg_statement(pdf_path: str, transaction_count: int, seed: int = 0) -> str:
+    """SG statement: 'du 09/04/2021 au 06/05/2021', dates as dd/mm/yyyy, amounts as 1.234,56."""
+    rnd = random.Random(seed)
+    start_date = datetime(2021, 4, 9) + timedelta(days=31 * (seed % 12))
+    end_date = start_date + timedelta(days=27)
+    transactions = random_transactions(transaction_count, start_date, 27, rnd)
+    initial_balance = Decimal(rnd.randrange(100000, 500000)) / 100
+    total_expense = sum((transaction[2] for transaction in transactions), Decimal(0))
+    total_income = sum((transaction[3] for transaction in transactions), Decimal(0))
+    final_balance = initial_balance + total_income - total_expense
+
+    rows = [[f"SOLDE PRÉCÉDENT AU {start_date:%d/%m/%Y}", "", "", "", format_sg_amount(initial_balance)]]
+    for date, description, expense, income in transactions:
+        rows.append([f"{date:%d/%m/%Y}", f"{date:%d/%m/%Y}", description,
+                     format_sg_amount(expense) if expense else "", format_sg_amount(income) if income else ""])
+        if rnd.random() < 0.2:
+            rows.append(["", "", f" REF {rnd.randrange(10 ** 8):08d}", "", ""])
+    rows.append(["", "", "TOTAUX DES MOUVEMENTS", format_sg_amount(total_expense), format_sg_amount(total_income)])
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+    widths = [60, 18, 65, 23, 24]
+    for page_index, page_rows in enumerate(_table_pages(rows)):
+        _add_page(pdf, "SOCIETE GENERALE", page_index + 1)
+        if page_index == 0:
+            pdf.cell(0, 8, f"RELEVE DE COMPTE du {start_date:%d/%m/%Y} au {end_date:%d/%m/%Y}")
+            pdf.ln(8)
+        pdf.cell(0, 8, "Date      Valeur      Nature de l'opération      Débit      Crédit")
+        pdf.ln(10)
+        _draw_table_page(pdf, widths, page_rows, pdf.get_y())
+    pdf.ln(6)
+    pdf.cell(0, 8, f"NOUVEAU SOLDE AU {end_date:%d/%m/%Y} + {format_sg_amount(final_balance)}")
+    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+    pdf.output(pdf_path)
+    return pdf_path
+
+
+def generate_revolut_csv(csv_path: str, transaction_count: int, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    start_date = datetime(2023, 1, 1) + timedelta(days=365 * (seed % 3))
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        f.write("Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,State,Balance\n")
+        for date, description, expense, income in random_transactions(transaction_count, start_date, 365, rnd):
+            started = date + timedelta(seconds=rnd.randrange(86400))
+            amount = income if income else -expense
+            f.write(f"CARD_PAYMENT,Current,{started:%Y-%m-%d %H:%M:%S},{started:%Y-%m-%d %H:%M:%S},"
+                    f"\"{description.title()}\",{amount},0.00,EUR,COMPLETED,1000.00\n")
+    return csv_path
+
+
+def generate_sncf_voyage(pdf_path: str, seed: int = 0) -> str:
+    """SNCF 'JUSTIFICATIF DE VOYAGE' proof, parsed by TripVoyageExtractor."""
+    rnd = random.Random(seed)
+    trip_date = datetime(2024, 1, 1) + timedelta(days=rnd.randrange(365))
+    amount = Decimal(rnd.randrange(500, 9000)) / 100
+    lines = ["JUSTIFICATIF DE VOYAGE", f"Aller le {trip_date:%d/%m/%Y}",
+             "De Compiegne", "à Paris", f"Montant du voyage {format_bnp_amount(amount)}"]
+    return _write_text_pdf(pdf_path, lines)
+
+
+def generate_sncf_achat(pdf_path: str, seed: int = 0) -> str:
+    """SNCF "JUSTIFICATIF D'ACHAT" proof, parsed by TripAchatExtractor."""
+    rnd = random.Random(seed)
+    trip_date = datetime(2024, 1, 1) + timedelta(days=rnd.randrange(365), minutes=rnd.randrange(1440))
+    amount = Decimal(rnd.randrange(500, 9000)) / 100
+    lines = ["JUSTIFICATIF D'ACHAT", f"Aller {trip_date:%d/%m/%Y} à {trip_date:%H:%M:%S}",
+             "Compiègne (FR)", "Paris Gare du Nord", f"Montant total (TTC) : {EURO}{amount:.2f}"]
+    return _write_text_pdf(pdf_path, lines)
+
+
+def _write_text_pdf(pdf_path: str, lines: list[str]) -> str:
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=11)
+    pdf.add_page()
+    for line in lines:
+        pdf.cell(0, 8, line)
+        pdf.ln(8)
+    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+    pdf.output(pdf_path)
+    return pdf_path
+
+
+def generate_data(root_dir: str,
+                  statements_per_bank: int = 3,
+                  transactions_per_statement: int = 60,
+                  revolut_transactions: int = 2000,
+                  trips: int = 20) -> dict[str, str]:
+    """
+    Generate a data folder with the architecture of ConstGl (bank/bnp, bank/hello_bank, bank/revolut, bank/sg,
+    frais/sncf/trips).
+
+    :return: Dictionary mapping each document kind to its directory
+    """
+    directories = {
+        "bnp": os.path.join(root_dir, "bank", "bnp"),
+        "hello_bank": os.path.join(root_dir, "bank", "hello_bank"),
+        "revolut": os.path.join(root_dir, "bank", "revolut"),
+        "sg": os.path.join(root_dir, "bank", "sg"),
+        "sncf": os.path.join(root_dir, "frais", "sncf", "trips"),
+    }
+    for i in range(statements_per_bank):
+        generate_bnp_statement(os.path.join(directories["bnp"], f"RLV_CHQ_{i:03d}.pdf"),
+                               transactions_per_statement, seed=i)
+        generate_bnp_statement(os.path.join(directories["hello_bank"], f"RLV_HELLO_{i:03d}.pdf"),
+                               transactions_per_statement, seed=100 + i, bank_name="HELLO BANK!")
+        generate_sg_statement(os.path.join(directories["sg"], f"SG_{i:03d}.pdf"),
+                              transactions_per_statement, seed=200 + i)
+    generate_revolut_csv(os.path.join(directories["revolut"], "account_statement.csv"), revolut_transactions)
+    for i in range(trips):
+        if i % 2:
+            generate_sncf_voyage(os.path.join(directories["sncf"], f"voyage_{i:03d}.pdf"), seed=i)
+        else:
+            generate_sncf_achat(os.path.join(directories["sncf"], f"achat_{i:03d}.pdf"), seed=i)
+    return directories
@@ -0,0 +1,68 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pandas as pd
+
+from bank.model.transaction import BankStatement, Transaction
+from bank.model.transaction_table import TransactionTable
+
+
+def generate_rows(count: int) -> list[tuple]:
+    merchants = [f'CARTE X1234 {day:02d}/01 MERCHANT {day % 40}' for day in range(1, 29)]
+    start = datetime(2024, 1, 1)
+    return [('BNP', start + timedelta(days=i % 365), merchants[i % len(merchants)],
+             Decimal(f'{i % 500}.{i % 100:02d}'), Decimal(0), '/statements/RLV_CHQ_2024.pdf')
+            for i in range(count)]
+
+
+def models_to_frame(transactions: list[Transaction]) -> pd.DataFrame:
+    return pd.DataFrame({field: [getattr(transaction, field) for transaction in transactions]
+                         for field in Transaction.model_fields})
+
+
+def time_per_row(function, count: int) -> float:
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark per-row cost of Transaction models vs TransactionTable")
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args(argv)
+    rows = generate_rows(args.rows)
+
+    def build_models():
+        return [Transaction(bank_nomination=bank, transaction_date=date, description=description,
+                            expense_amount=expense, income_amount=income, proof_document=proof)
+                for bank, date, description, expense, income, proof in rows]
+
+    def build_table():
+        table = TransactionTable()
+        for row in rows:
+            table.append(*row)
+        return table
+
+    table = build_table()
+    statement_json = BankStatement(transactions=build_models()).model_dump_json()
+
+    results = {
+        "extraction: Transaction model per row": time_per_row(build_models, args.rows),
+        "extraction: TransactionTable.append per row": time_per_row(build_table, args.rows),
+        "validation: TransactionTable.validate, whole table": time_per_row(table.validate, args.rows),
+        "boundary: TransactionTable.to_transactions": time_per_row(table.to_transactions, args.rows),
+        "cache hit: BankStatement.model_validate_json + DataFrame":
+            time_per_row(lambda: models_to_frame(BankStatement.model_validate_json(statement_json).transactions),
+                         args.rows),
+        "cache hit: TransactionTable.from_statement_json + DataFrame":
+            time_per_row(lambda: TransactionTable.from_statement_json(statement_json).to_frame(), args.rows),
+    }
+    print(f"{args.rows} rows, cost per row:")
+    for name, micro_seconds in results.items():
+        print(f"{name:65} {micro_seconds:8.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,24 @@
 import os
 
 
-class ConstGl:
+class _LazyConfig(type):
+    """
+    Applies the local configuration (see load_config) on the first read or write of a setting,
+    so that importing ConstGl has no side effect.
+    """
+    def __getattribute__(cls, name):
+        if not name.startswith('_'):
+            load_config()
+        return super().__getattribute__(name)
+
+    def __setattr__(cls, name, value):
+        # settings assigned by the code (e.g. a benchmark) win over the local configuration
+        if not name.startswith('_'):
+            load_config()
+        super().__setattr__(name, value)
+
+
+class ConstGl(metaclass=_LazyConfig):
     PERSON_FULL_NAME = 'FirstName LASTNAME'
 
     # Data paths architecture: convention over configuration
@@ -31,6 +48,8 @@ class ConstGl:
                 -> sg
                     -> 2021-01-01.pdf
                     -> ...
+                -> inbox
+                    -> statements of any bank
     """
     PATH_TO_DATA = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
     TEMP_DIR = os.path.join(PATH_TO_DATA, 'temp')
@@ -48,15 +67,33 @@ class ConstGl:
     PATH_TO_DATA_FRAIS_SNCF_TRIPS = os.path.join(PATH_TO_DATA_FRAIS_SNCF, 'trips')
     PATH_TO_DATA_FRAIS_RESULT = os.path.join(PATH_TO_DATA, 'result')
 
-    PATH_TO_WK_HTML_TO_PDF = r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe'
-
     # Bank data
     PATH_TO_BANK_DATA = os.path.join(PATH_TO_DATA, 'bank')
     PATH_TO_BANK_DATA_BNP = os.path.join(PATH_TO_BANK_DATA, 'bnp')
     PATH_TO_BANK_DATA_HELLO_BANK = os.path.join(PATH_TO_BANK_DATA, 'hello_bank')
     PATH_TO_BANK_DATA_REVOLUT = os.path.join(PATH_TO_BANK_DATA, 'revolut')
     PATH_TO_BANK_DATA_SG = os.path.join(PATH_TO_BANK_DATA, 'sg')
+    # statements of any bank, e.g. the downloads folder, each file is routed to its extractor
+    PATH_TO_BANK_DATA_INBOX = os.path.join(PATH_TO_BANK_DATA, 'inbox')
     PATH_TO_BANK_RESULT = os.path.join(PATH_TO_DATA, 'result')
+    PATH_TO_BANK_TRANSACTIONS_DATASET = os.path.join(PATH_TO_BANK_RESULT, 'transactions')
+    PATH_TO_BANK_RUN_MANIFEST = os.path.join(PATH_TO_BANK_RESULT, 'bank_run_manifest.json')
+
+
+_config_loaded = False
+
+
+def load_config():
+    """
+    Override the ConstGl settings with the ones of const_gl_local.py, once.
+    Called on the first use of a setting, an entry point can call it to load the configuration upfront.
+    Directories are not created, see setup_dirs.
+    """
+    global _config_loaded
+    if _config_loaded:
+        return
+    _config_loaded = True
+    update_from_local()
 
 
 def update_from_local():
@@ -72,9 +109,9 @@ def update_from_local():
     except ImportError as e:
         # If const_gl_local.py does not exist, use ConstGl as is
         pass
-    setup_dirs()
 
 def setup_dirs():
+    """Create the data directories, called by the entry points before reading or writing data."""
     dirs = [
         ConstGl.PATH_TO_DATA,
         ConstGl.TEMP_DIR,
@@ -86,11 +123,10 @@ def setup_dirs():
         ConstGl.PATH_TO_BANK_DATA_HELLO_BANK,
         ConstGl.PATH_TO_BANK_DATA_REVOLUT,
         ConstGl.PATH_TO_BANK_DATA_SG,
+        ConstGl.PATH_TO_BANK_DATA_INBOX,
         ConstGl.PATH_TO_BANK_RESULT,
     ]
 
     for dir_path in dirs:
         if not os.path.exists(dir_path):
             os.makedirs(dir_path)
-
-update_from_local()
@@ -1,63 +1,123 @@
+import argparse
 import locale
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from typing import TYPE_CHECKING, Iterator, Optional
 
-import fitz  # PyMuPDF
-import pandas as pd
-from tqdm import tqdm
-
-from const.const_gl import ConstGl
+from const.const_gl import ConstGl, setup_dirs
 from frais.misc import special_frais
 from frais.model.frais_details import FraisDetails
 from frais.report import create_report
 from frais.sncf.trip_achat_extractor import TripAchatExtractor
 from frais.sncf.trip_extractor import TripExtractor
 from frais.sncf.trip_voyage_extractor import TripVoyageExtractor
-from util import pdf_merger, os_util, pdf_number
+from util import pdf_merger, os_util, tracing
 from util.result_file_cache import ResultFileCache
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def extract_trip_frais_details(pdf_path: str, extractors: list[TripExtractor]) -> FraisDetails:
-    frais_details = None
-    # Open the PDF file
-    with fitz.open(pdf_path) as pdf:
-        # Loop through each page and extract text
-        for page_num in range(pdf.page_count):
-            page = pdf[page_num]
-            text = page.get_text()
 
-            # Extract trip date
-            for extractor in extractors:
-                if extractor.is_supported(text):
-                    frais_details = extractor.get_frais_details(text, pdf_path)
-                    break
+# below this number of documents missing from the cache, starting worker processes costs more than it saves
+MIN_DOCUMENTS_FOR_PARALLEL = 8
+# locale of the day names of the report
+FRAIS_LOCALE = "fr_FR.UTF-8"
 
-    if frais_details is None:
-        raise ValueError(f"No supported extractor found for {pdf_path}")
 
-    return frais_details
+def set_frais_locale():
+    """Write the day names of the report in French, in English when the French locale isn't installed."""
+    try:
+        locale.setlocale(locale.LC_TIME, FRAIS_LOCALE)
+    except locale.Error:
+        print(f"Locale {FRAIS_LOCALE} is not installed, the day names of the report are written in English")
 
 
-def extract_trip_frais_from_dir(pdf_dir: str, extractors: list[TripExtractor]) -> list[FraisDetails]:
-    data = []
-    # Iterate over each PDF file in the directory
-    result_hasher = ResultFileCache()
-
-    def extract_function(pdf_path_par: str) -> FraisDetails:
-        return extract_trip_frais_details(pdf_path_par, extractors)
+def extract_trip_frais_details(pdf_path: str, extractors: list[TripExtractor]) -> FraisDetails:
+    import fitz  # PyMuPDF
 
-    def found_callback(frais_details_par: FraisDetails, pdf_path_par: str):
-        frais_details_par.proof_document = pdf_path_par
+    # Open the PDF file
+    with tracing.span("extract_trip_frais_details", document=pdf_path), fitz.open(pdf_path) as pdf:
+        # the first page claimed by an extractor is the trip proof, the next pages are not read
+        for page in pdf:
+            text = page.get_text()
+            for extractor in extractors:
+                if extractor.is_supported(text):
+                    return extractor.get_frais_details(text, pdf_path)
+
+    raise ValueError(f"No supported extractor found for {pdf_path}")
+
+
+def extract_trip_frais_from_dir(pdf_dir: str,
+                                extractors: list[TripExtractor],
+                                result_hasher: Optional[ResultFileCache] = None,
+                                jobs: int = 1) -> list[FraisDetails]:
+    """
+    Frais details of every trip proof of the directory, from the cache or extracted.
+    When jobs > 1, the proofs missing from the cache are extracted by a pool of `jobs` processes,
+    and written back to the cache from the main process.
+    """
+    from tqdm import tqdm
+
+    result_hasher = result_hasher or ResultFileCache()
+    pdf_paths = [os.path.join(pdf_dir, filename) for filename in os.listdir(pdf_dir) if filename.endswith('.pdf')]
+
+    # look up the cache first so that every cache miss is submitted at once
+    documents = []
+    for pdf_path in pdf_paths:
+        file_hash = result_hasher.compute_hash(pdf_path)
+        with tracing.span("get_document_by_hash", document=pdf_path):
+            frais_details = result_hasher.get_document_by_hash(file_hash, FraisDetails)
+        if frais_details:
+            # the cached proof may have been renamed
+            frais_details.proof_document = pdf_path
+        documents.append((pdf_path, file_hash, frais_details))
+
+    missing_paths = [pdf_path for pdf_path, _, frais_details in documents if frais_details is None]
+    extracted_by_path = {}
+    # the bar moves as each proof is extracted, the cached ones are counted from the start
+    with tqdm(total=len(documents), initial=len(documents) - len(missing_paths),
+              desc="Processing trip frais") as progress:
+        for pdf_path, frais_details in zip(missing_paths, iter_trip_frais_details(missing_paths, extractors, jobs)):
+            print(f"Processing and caching {pdf_path}")
+            extracted_by_path[pdf_path] = frais_details
+            progress.update()
 
-    for filename in tqdm(os.listdir(pdf_dir), desc="Processing trip frais"):
-        if filename.endswith('.pdf'):
-            pdf_path = os.path.join(pdf_dir, filename)
-            frais_details: FraisDetails = result_hasher.get_or_process_document(pdf_path, extract_function, found_callback)
-            data.append(frais_details)
+    data = []
+    for pdf_path, file_hash, frais_details in documents:
+        if frais_details is None:
+            frais_details = extracted_by_path[pdf_path]
+            result_hasher.update_hash_map(pdf_path, frais_details, file_hash)
+        data.append(frais_details)
     return data
 
 
-def get_printed_df(df: pd.DataFrame, total_amount: float) -> pd.DataFrame:
+def iter_trip_frais_details(pdf_paths: list[str],
+                            extractors: list[TripExtractor],
+                            jobs: int = 1) -> Iterator[FraisDetails]:
+    """
+    Frais details of the trip proofs, in order, yielded as soon as each one is extracted.
+    When jobs > 1, the proofs are extracted by a pool of `jobs` processes.
+    """
+    if jobs <= 1 or len(pdf_paths) < MIN_DOCUMENTS_FOR_PARALLEL:
+        for pdf_path in pdf_paths:
+            yield extract_trip_frais_details(pdf_path, extractors)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        if tracing.is_enabled():
+            # spans of the worker processes are sent back with the frais details
+            for frais_details, events in executor.map(tracing.run_collecting_events,
+                                                      [extract_trip_frais_details] * len(pdf_paths), pdf_paths,
+                                                      [extractors] * len(pdf_paths), chunksize=4):
+                tracing.add_events(events)
+                yield frais_details
+        else:
+            yield from executor.map(extract_trip_frais_details, pdf_paths, [extractors] * len(pdf_paths), chunksize=4)
+
+
+def get_printed_df(df: 'pd.DataFrame', total_amount: float) -> 'pd.DataFrame':
+    import pandas as pd
+
     # keep only and reorder columns
     printed_df = df[['payment_date_f', 'payment_day', 'comment', 'printed_proof', 'amount_paid', ]]
 
@@ -77,7 +137,10 @@ def get_printed_df(df: pd.DataFrame, total_amount: float) -> pd.DataFrame:
 
 def analyse_frais_details(frais_details: list[FraisDetails],
                           start_datetime: datetime,
-                          end_datetime: datetime = None):
+                          end_datetime: datetime = None,
+                          result_hasher: Optional[ResultFileCache] = None):
+    import pandas as pd
+
     total_amount = 0
     included_frais = []
     for frais in frais_details:
@@ -95,57 +158,81 @@ def analyse_frais_details(frais_details: list[FraisDetails],
     # format day as dddd capitalized (e.g., 'Vendredi')
     df['payment_day'] = payment_datetime_col.dt.strftime('%A').str.capitalize()
 
-    # add a fake printed proof
-    df['printed_proof'] = df['proof_document'].apply(lambda x: 'Page 12/321')
-
     # sort by payment date descending
     df = df.sort_values(by='payment_date', ascending=False)
-    printed_df = get_printed_df(df, total_amount)
-    # replace proof_document with starting page number
-    summary_pdf = create_report.create_summary_pdf(printed_df, '31/12/2023')
-    # merge all pdfs into a single one
+    # the proofs follow the summary in the merged pdf, whose page count is known from its rows (+ the total row)
+    summary_page_count = create_report.predict_summary_page_count(len(df) + 1)
     sorted_included_frais = sorted(included_frais, key=lambda x: x.payment_date, reverse=True)
-    pdf_files = [summary_pdf] + [frais.proof_document for frais in sorted_included_frais]
-
-    file_to_starting_page, total_pages = pdf_merger.predict_starting_page(pdf_files)
+    file_to_starting_page, total_pages = pdf_merger.predict_starting_page(
+        [frais.proof_document for frais in sorted_included_frais], summary_page_count + 1, result_hasher)
 
+    # replace proof_document with starting page number
     df['printed_proof'] = df['proof_document'].apply(lambda x: f'Page {file_to_starting_page[x]}')
     printed_df = get_printed_df(df, total_amount)
     return printed_df, included_frais
 
 
-def main():
-    # Set locale to French (France)
-    locale.setlocale(locale.LC_TIME, "fr_FR.UTF-8")
-    # Use the function on your PDF file
-    # Example usage
+def build_frais_report(start_date: str, result_hasher: Optional[ResultFileCache] = None, jobs: int = 1) -> str:
+    """
+    Build the all in one frais PDF: summary followed by every proof document since start_date (day/month/year).
+    The cache can be kept between calls, e.g. by the watch daemon.
+
+    :param jobs: number of processes extracting the trip proofs missing from the cache
+    :return: path of the all in one frais PDF
+    """
     directory_path = ConstGl.PATH_TO_DATA_FRAIS_SNCF_TRIPS
-    start_date = '01/10/2023'  # Specify the desired start date (day/month/year)
+    result_hasher = result_hasher or ResultFileCache()
     start_datetime = datetime.strptime(start_date, '%d/%m/%Y')
     # Create a list of extractors
     extractors = [TripVoyageExtractor(), TripAchatExtractor()]
     # Extract trip frais details
-    frais_details = extract_trip_frais_from_dir(directory_path, extractors)
+    with tracing.span("extract_trip_frais_from_dir"):
+        frais_details = extract_trip_frais_from_dir(directory_path, extractors, result_hasher, jobs)
     # Analyse frais details
     all_frais_details = frais_details + special_frais.read_special_frais().frais_details
 
-    df, included_frais = analyse_frais_details(all_frais_details, start_datetime)
+    with tracing.span("analyse_frais_details"):
+        df, included_frais = analyse_frais_details(all_frais_details, start_datetime, result_hasher=result_hasher)
 
     # get max payment date
     end_datetime = max([frais.payment_date for frais in included_frais])
     end_datetime_str = end_datetime.strftime('%d/%m/%Y')
 
-    summary_pdf = create_report.create_summary_pdf(df, end_datetime_str)
+    with tracing.span("create_summary_pdf"):
+        summary_pdf = create_report.create_summary_pdf(df, end_datetime_str)
 
     # merge all pdfs into a single one
     sorted_included_frais = sorted(included_frais, key=lambda x: x.payment_date, reverse=True)
     pdf_files = [summary_pdf] + [frais.proof_document for frais in sorted_included_frais]
 
     aio_filename = f'aio_frais_{start_date}_{end_datetime_str}.pdf'.replace('/', '_')
-    aio_merged_temp_pdf_path = os.path.join(ConstGl.TEMP_DIR, aio_filename)
-    pdf_merger.merge_pdfs_with_bookmarks(pdf_files, aio_merged_temp_pdf_path)
     aio_merged_pdf_path = os.path.join(ConstGl.PATH_TO_DATA_FRAIS_RESULT, aio_filename)
-    pdf_number.add_page_numbers(aio_merged_temp_pdf_path, aio_merged_pdf_path)
+    # pages, bookmarks and page numbers written at once to the final path
+    with tracing.span("merge_pdfs_with_bookmarks", documents=len(pdf_files)):
+        pdf_merger.merge_pdfs_with_bookmarks(pdf_files, aio_merged_pdf_path, number_pages=True)
+    return aio_merged_pdf_path
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Build the all in one frais PDF from the SNCF trips proofs")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of processes used to extract the trip proofs missing from the cache")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time spent per stage and per document, and write a Chrome trace")
+    args = parser.parse_args(argv)
+    if args.profile:
+        tracing.enable()
+
+    setup_dirs()
+    set_frais_locale()
+    start_date = '01/10/2023'  # Specify the desired start date (day/month/year)
+    try:
+        with tracing.span("build_frais_report"):
+            aio_merged_pdf_path = build_frais_report(start_date, jobs=args.jobs)
+    finally:
+        if args.profile:
+            tracing.print_report()
+            tracing.write_chrome_trace(os.path.join(ConstGl.TEMP_DIR, 'profile', 'frais_calculator_trace.json'))
     os_util.open_with_associated_program(aio_merged_pdf_path)
 
 
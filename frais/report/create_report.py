@@ -1,73 +1,123 @@
+import math
 import os.path
-from datetime import datetime
-
-import pandas as pd
-from jinja2 import Template
-import pdfkit
+from typing import TYPE_CHECKING
 
 from const.const_gl import ConstGl
+from util import tracing
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from fpdf import FPDF
+
+# A4 portrait layout, in mm. Every row has the same height (cell text is shortened to fit its column)
+# and a page is broken when the next row doesn't fit above the bottom margin, so the page count only depends
+# on the number of rows
+PAGE_HEIGHT = 297
+MARGIN = 15
+TITLE_HEIGHT = 10
+SUBTITLE_HEIGHT = 8
+TITLE_SPACING = 4
+HEADER_ROW_HEIGHT = 8
+ROW_HEIGHT = 7
+CELL_PADDING = 1.5
+# Date, Jour, Commentaire, Justificatif, Montant
+COLUMN_WIDTHS = [25, 25, 80, 25, 25]
+TITLE_COLOR = (0, 86, 179)
+BORDER_COLOR = (221, 221, 221)
+
+_TABLE_HEIGHT = PAGE_HEIGHT - 2 * MARGIN - HEADER_ROW_HEIGHT
+ROWS_FIRST_PAGE = int((_TABLE_HEIGHT - TITLE_HEIGHT - SUBTITLE_HEIGHT - TITLE_SPACING) // ROW_HEIGHT)
+ROWS_PER_PAGE = int(_TABLE_HEIGHT // ROW_HEIGHT)
+
+
+def predict_summary_page_count(row_count: int) -> int:
+    """
+    Number of pages of the summary PDF of a DataFrame of row_count rows, without rendering it
+    (the rendered page count is checked against it, see create_summary_pdf).
+    Example:
+    >>> predict_summary_page_count(33), predict_summary_page_count(34)
+    (1, 2)
+    """
+    if row_count <= ROWS_FIRST_PAGE:
+        return 1
+    return 1 + math.ceil((row_count - ROWS_FIRST_PAGE) / ROWS_PER_PAGE)
 
 
-def create_summary_pdf(df: pd.DataFrame, freshness_date: str) -> str:
+def _pdf_text(value) -> str:
+    # the core fonts are cp1252 encoded, other characters are replaced by '?'
+    text = f"{value:.2f}" if isinstance(value, float) else str(value)
+    return text.encode('cp1252', 'replace').decode('latin-1')
+
+
+def _fit_text(pdf: 'FPDF', text: str, width: float) -> str:
+    """Text shortened with an ellipsis to fit the cell width, rows are never wrapped."""
+    if pdf.get_string_width(text) <= width - 2 * CELL_PADDING:
+        return text
+    while text and pdf.get_string_width(text + '...') > width - 2 * CELL_PADDING:
+        text = text[:-1]
+    return text + '...'
+
+
+def _add_header_row(pdf: 'FPDF', columns: list[str]):
+    pdf.set_font('Helvetica', 'B', 10)
+    pdf.set_fill_color(*TITLE_COLOR)
+    pdf.set_text_color(255, 255, 255)
+    for width, column in zip(COLUMN_WIDTHS, columns):
+        pdf.cell(width, HEADER_ROW_HEIGHT, _fit_text(pdf, _pdf_text(column), width), border=1, fill=1)
+    pdf.ln(HEADER_ROW_HEIGHT)
+    pdf.set_font('Helvetica', '', 9)
+    pdf.set_text_color(51, 51, 51)
+
+
+def create_summary_pdf(df: 'pd.DataFrame', freshness_date: str) -> str:
     """
-    Create a PDF report from a DataFrame with enhanced styling and dynamic title
+    Create the PDF summary table of a DataFrame, with a title and its freshness date, rendered in-process.
+    Its number of pages is predict_summary_page_count(len(df)), the page numbers of the proofs following
+    the summary are computed from it before rendering.
     Example:
     >>> df = pd.DataFrame({'A': [1, 2], 'B': [3, 4]})
     >>> create_summary_pdf(df, '2024-08-06')
     'data/temp/summary_table.pdf'
     :return: Path to the generated PDF file
+    :raise ValueError: when the rendered summary doesn't have the predicted number of pages
     """
-    # Define HTML template with enhanced styling and dynamic title
-    html_template = Template("""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>Thierry Lastname - Frais jusqu'à {{ freshness_date }}</title>
-<style>
-    body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f4f4f9; color: #333; }
-    h2 { color: #0056b3; }
-    .container { max-width: 800px; margin: auto; padding: 20px; background-color: #ffffff; border-radius: 8px; box-shadow: 0px 0px 10px rgba(0, 0, 0, 0.1); }
-    table { width: 100%; border-collapse: collapse; margin-top: 20px; }
-    th, td { border: 1px solid #dddddd; text-align: left; padding: 8px; }
-    th { background-color: #0056b3; color: white; }
-</style>
-</head>
-<body>
-    <div class="container">
-        <h2>{{ person_fullname | safe }}</h2>
-        <p><strong>Frais jusqu'à:</strong> {{ freshness_date }}</p>
-        {{ data | safe }}
-    </div>
-</body>
-</html>
-""")
-
-    # Generate HTML from DataFrame with dynamic freshness date
-    html_output = html_template.render(
-        person_fullname=ConstGl.PERSON_FULL_NAME,
-        data=df.to_html(index=False),
-        freshness_date=freshness_date
-    )
-
-    # Convert HTML to PDF
+    from fpdf import FPDF
+
     temp_dir = ConstGl.TEMP_DIR
-    html_file = f"{temp_dir}/frais_summary_table.html"
     pdf_file = f"{temp_dir}/frais_summary_table.pdf"
     os.makedirs(temp_dir, exist_ok=True)
-    with open(html_file, "w", encoding="utf-8") as file:
-        file.write(html_output)
-
-    # download from https://wkhtmltopdf.org/downloads.html
-    path_wkhtmltopdf = ConstGl.PATH_TO_WK_HTML_TO_PDF
-
-    if not os.path.exists(path_wkhtmltopdf):
-        print("wkhtmltopdf could not be found at {}".format(path_wkhtmltopdf))
-        print("Let pdfkit find it automatically")
-        pdfkit.from_file(html_file, pdf_file)
-    else:
-        config = pdfkit.configuration(wkhtmltopdf=path_wkhtmltopdf)
-        pdfkit.from_file(html_file, pdf_file, configuration=config)
+
+    with tracing.span("render_summary_pdf", rows=len(df)):
+        pdf = FPDF(orientation='P', unit='mm', format='A4')
+        pdf.set_margins(MARGIN, MARGIN, MARGIN)
+        pdf.set_auto_page_break(False)
+        pdf.set_title(_pdf_text(f"{ConstGl.PERSON_FULL_NAME} - Frais jusqu'à {freshness_date}"))
+        pdf.set_draw_color(*BORDER_COLOR)
+        pdf.add_page()
+        pdf.set_font('Helvetica', 'B', 16)
+        pdf.set_text_color(*TITLE_COLOR)
+        pdf.cell(0, TITLE_HEIGHT, _pdf_text(ConstGl.PERSON_FULL_NAME))
+        pdf.ln(TITLE_HEIGHT)
+        pdf.set_font('Helvetica', '', 11)
+        pdf.set_text_color(51, 51, 51)
+        pdf.cell(0, SUBTITLE_HEIGHT, _pdf_text(f"Frais jusqu'à: {freshness_date}"))
+        pdf.ln(SUBTITLE_HEIGHT + TITLE_SPACING)
+        columns = [str(column) for column in df.columns]
+        _add_header_row(pdf, columns)
+
+        for row in df.itertuples(index=False):
+            if pdf.get_y() + ROW_HEIGHT > PAGE_HEIGHT - MARGIN:
+                pdf.add_page()
+                _add_header_row(pdf, columns)
+            for column, (width, value) in enumerate(zip(COLUMN_WIDTHS, row)):
+                # amounts, the last column, are right aligned
+                align = 'R' if column == len(COLUMN_WIDTHS) - 1 else 'L'
+                pdf.cell(width, ROW_HEIGHT, _fit_text(pdf, _pdf_text(value), width), border=1, align=align)
+            pdf.ln(ROW_HEIGHT)
+        predicted_page_count = predict_summary_page_count(len(df))
+        if pdf.page_no() != predicted_page_count:
+            raise ValueError(f"Summary rendered on {pdf.page_no()} pages instead of {predicted_page_count}, "
+                             f"the page numbers of the proofs are wrong")
+        pdf.output(pdf_file, 'F')
 
     return pdf_file
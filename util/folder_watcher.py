@@ -0,0 +1,41 @@
+import os
+import time
+
+
+class FolderWatcher:
+    """
+    Polling watcher of the files of some directories (not recursive), portable and dependency free.
+    Changes are debounced: a burst of changes (e.g. several statements downloaded at once)
+    is reported once, when no file changed for debounce_seconds.
+    """
+
+    def __init__(self, directories: list[str], debounce_seconds: float = 5):
+        self.directories = directories
+        self.debounce_seconds = debounce_seconds
+        self._snapshot = self._take_snapshot()
+        self._last_change_time = None
+
+    def _take_snapshot(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for directory in self.directories:
+            if not os.path.exists(directory):
+                continue
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def poll(self) -> bool:
+        """Return True once the files changed and then stayed unchanged for debounce_seconds."""
+        snapshot = self._take_snapshot()
+        now = time.monotonic()
+        if snapshot != self._snapshot:
+            self._snapshot = snapshot
+            self._last_change_time = now
+            return False
+        if self._last_change_time is not None and now - self._last_change_time >= self.debounce_seconds:
+            self._last_change_time = None
+            return True
+        return False
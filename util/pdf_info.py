@@ -0,0 +1,28 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PdfInfo(BaseModel):
+    page_count: int
+    title: Optional[str] = None
+    author: Optional[str] = None
+    producer: Optional[str] = None
+    creation_date: Optional[str] = None
+
+
+def read_pdf_info(pdf_file: str) -> PdfInfo:
+    """
+    Page count and document information of a PDF, from its page tree and info dictionary (pages are not parsed).
+    Example:
+    >>> read_pdf_info('data/frais/sncf/trips/trip1.pdf')
+    PdfInfo(page_count=2, title='Justificatif', author=None, producer='PyFPDF 1.7.2 http://pyfpdf.googlecode.com/', creation_date='D:20240806')
+    """
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_file) as pdf:
+        metadata = pdf.metadata or {}
+        return PdfInfo(page_count=pdf.page_count,
+                       title=metadata.get('title') or None,
+                       author=metadata.get('author') or None,
+                       producer=metadata.get('producer') or None,
+                       creation_date=metadata.get('creationDate') or None)
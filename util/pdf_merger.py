@@ -1,7 +1,13 @@
 import os
-from PyPDF2 import PdfReader, PdfWriter
+from typing import Optional
 
-def predict_starting_page(pdf_files: list[str]) -> tuple[dict[str, int], int]:
+from util import tracing
+from util.pdf_info import read_pdf_info
+from util.result_file_cache import ResultFileCache
+
+def predict_starting_page(pdf_files: list[str],
+                          start_page: int = 1,
+                          result_cache: Optional[ResultFileCache] = None) -> tuple[dict[str, int], int]:
     """
     Predict the starting page of each PDF file in the merged PDF.
     Example:
@@ -9,51 +15,57 @@ def predict_starting_page(pdf_files: list[str]) -> tuple[dict[str, int], int]:
     >>> predict_starting_page(pdf_files)
     {'file1.pdf': 1, 'file2.pdf': 6}, 10
 
+    :param start_page: page of the first file, after the pages merged before the files (e.g. a summary not rendered yet)
+    :param result_cache: page counts are looked up in the cache, files are only read the first time they are seen
     :return: Dictionary mapping each PDF file to its starting page in the merged PDF and the total number of pages
     """
     pdf_to_start_page = {}
-    current_page = 0
+    current_page = start_page - 1
 
     for pdf_file in pdf_files:
         pdf_to_start_page[pdf_file] = current_page + 1
-        pdf_reader = PdfReader(pdf_file)
-        num_pages = len(pdf_reader.pages)
-        current_page += num_pages
+        with tracing.span("count_pages", document=pdf_file):
+            pdf_info = result_cache.get_pdf_info(pdf_file) if result_cache else read_pdf_info(pdf_file)
+        current_page += pdf_info.page_count
 
     return pdf_to_start_page, current_page + 1
 
-def merge_pdfs_with_bookmarks(pdf_files: list[str], output_filename: str):
+def merge_pdfs_with_bookmarks(pdf_files: list[str], output_filename: str, number_pages: bool = False):
     """
-    Merge multiple PDF files into a single PDF with bookmarks for each file.
+    Merge multiple PDF files into a single PDF with bookmarks for each file, in a single write of the output file.
     Example:
     >>> pdf_files = ['file1.pdf', 'file2.pdf']
-    >>> merge_pdfs_with_bookmarks(pdf_files, 'merged_file.pdf')
+    >>> merge_pdfs_with_bookmarks(pdf_files, 'merged_file.pdf', number_pages=True)
 
+    :param number_pages: stamp "Page <n>" on every page of the merged PDF (see pdf_number)
     :return: Dictionary mapping each PDF file to its starting page in the merged PDF
     """
-    pdf_writer = PdfWriter()
-    current_page = 0
+    import fitz  # PyMuPDF
+    from util import pdf_number
+
     pdf_to_start_page = {}
+    toc = []
 
-    for pdf_file in pdf_files:
-        pdf_to_start_page[pdf_file] = current_page + 1
-        pdf_reader = PdfReader(pdf_file)
-        num_pages = len(pdf_reader.pages)
-
-        # Add pages and keep track of page count
-        for page_num in range(num_pages):
-            pdf_writer.add_page(pdf_reader.pages[page_num])
-
-        # Add a bookmark with the filename as the title
-        bookmark_title = os.path.splitext(os.path.basename(pdf_file))[0]
-        pdf_writer.add_outline_item(bookmark_title, current_page)
-        current_page += num_pages
-
-    # create parent dir
-    os.makedirs(os.path.dirname(output_filename), exist_ok=True)
-    # Write the output PDF
-    with open(output_filename, "wb") as output_pdf:
-        pdf_writer.write(output_pdf)
+    with fitz.open() as merged_pdf:
+        for pdf_file in pdf_files:
+            start_page = merged_pdf.page_count + 1
+            pdf_to_start_page[pdf_file] = start_page
+            with tracing.span("add_pages", document=pdf_file), fitz.open(pdf_file) as pdf:
+                merged_pdf.insert_pdf(pdf)
+            # Add a bookmark with the filename as the title
+            toc.append([1, os.path.splitext(os.path.basename(pdf_file))[0], start_page])
+
+        if number_pages:
+            with tracing.span("stamp_page_numbers", pages=merged_pdf.page_count):
+                for page in merged_pdf:
+                    pdf_number.stamp_page_number(page, page.number + 1)
+        merged_pdf.set_toc(toc)
+
+        # create parent dir
+        os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+        # Write the output PDF
+        with tracing.span("save_merged_pdf", pages=merged_pdf.page_count):
+            merged_pdf.save(output_filename, garbage=1, deflate=True)
 
     output_filename = os.path.abspath(output_filename)
     print(f"PDFs merged into: {output_filename}")
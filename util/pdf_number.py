@@ -1,27 +1,34 @@
 from const.const_gl import ConstGl
 import fitz  # PyMuPDF
 
+from util import tracing
+
+
+# shared by every stamped page: inserting the font with each page number costs more than the text itself
+_PAGE_NUMBER_FONT = fitz.Font("helv")
+
+
+def stamp_page_number(page: fitz.Page, page_number: int):
+    """Write "Page <page_number>" as an overlay at the bottom center of the page."""
+    text = f"Page {page_number}"
+    x, y = page.rect.width / 2, page.rect.height - 75  # Adjust to place text at bottom-right
+
+    # Add the text as an overlay
+    text_writer = fitz.TextWriter(page.rect, color=(0, 86 / 255, 179 / 255))
+    text_writer.append((x, y), text, font=_PAGE_NUMBER_FONT, fontsize=12)
+    text_writer.write_text(page)
+
 
 def add_page_numbers(input_pdf_path, output_pdf_path):
     # Open the original PDF
     doc = fitz.open(input_pdf_path)
 
     for page_num in range(len(doc)):
-        page = doc[page_num]
-        # Define where the page number will be added
-        text = f"Page {page_num + 1}"
-        x, y = page.rect.width / 2, page.rect.height - 75  # Adjust to place text at bottom-right
-
-        # Add the text as an overlay
-        page.insert_text((x, y),
-                         text,
-                         fontname="helv",
-                         fontsize=12,
-                         rotate=0,
-                         color=(0, 86 / 255, 179 / 255), )
+        stamp_page_number(doc[page_num], page_num + 1)
 
     # Save the output with original bookmarks
-    doc.save(output_pdf_path)
+    with tracing.span("save_numbered_pdf", pages=len(doc)):
+        doc.save(output_pdf_path)
 
 
 if __name__ == "__main__":
@@ -1,61 +1,183 @@
 import hashlib
 import json
 import os
-from typing import Dict, Optional, Callable, TypeVar
+import sqlite3
+from typing import Optional, Callable, TypeVar
 
 from pydantic import BaseModel
 
 from const.const_gl import ConstGl
+from util import tracing
+from util.pdf_info import PdfInfo, read_pdf_info
 
 T = TypeVar('T', bound=BaseModel)
 
 class ResultFileCache:
+    """
+    Content-hash keyed cache of processed documents.
+    Each document is stored as its own row of a SQLite database (WAL journal), so a new entry
+    costs a single small write, entries are loaded lazily by hash and several runs can share
+    the same cache directory.
+    File content hashes are indexed by path and file metadata (size, mtime, inode), so
+    unchanged files are not read again to recompute their hash.
+    The page count and information of PDF documents (e.g. frais proofs) are kept in a sibling table,
+    also keyed by content hash, like the extractor each document of the inbox is routed to.
+    """
+    LEGACY_MAP_FILE_NAME = 'result_hash_map.json'
+    HASH_READ_BUFFER_SIZE = 1024 * 1024
+
     def __init__(self, map_file: str = None):
         if map_file is None:
-            map_file = os.path.join(ConstGl.TEMP_DIR, 'cache', 'result_hash_map.json')
+            map_file = os.path.join(ConstGl.TEMP_DIR, 'cache', 'result_cache.sqlite')
         self.map_file = map_file
-        self.hash_map: Dict[str, str] = self._load_hash_map()
+        parent_directory = os.path.dirname(self.map_file)
+        if parent_directory:
+            os.makedirs(parent_directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.map_file, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents (hash TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "inode INTEGER NOT NULL, hash TEXT NOT NULL)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pdf_info (hash TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS routes ("
+            "hash TEXT NOT NULL, router TEXT NOT NULL, extractor TEXT, PRIMARY KEY (hash, router))")
+        self._connection.commit()
+        self._import_legacy_hash_map()
 
-    def _load_hash_map(self) -> Dict[str, str]:
-        if os.path.exists(self.map_file):
-            with open(self.map_file, "r") as file:
-                return json.load(file)
-        return {}
+    def _import_legacy_hash_map(self):
+        """
+        Import entries of the former single JSON blob cache, then rename it so it is imported only once.
+        Runs opening the cache together (e.g. the CLI and the watch daemon) take the write lock in turn,
+        the file is imported by the first one and is already renamed for the others.
+        """
+        legacy_map_file = os.path.join(os.path.dirname(self.map_file), self.LEGACY_MAP_FILE_NAME)
+        if not os.path.exists(legacy_map_file):
+            return
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            with open(legacy_map_file, "r") as file:
+                legacy_hash_map: dict[str, str] = json.load(file)
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO documents (hash, data) VALUES (?, ?)",
+                legacy_hash_map.items())
+            os.replace(legacy_map_file, legacy_map_file + '.imported')
+        except FileNotFoundError:
+            # already imported by a concurrent run
+            self._connection.rollback()
+            return
+        except BaseException:
+            self._connection.rollback()
+            raise
+        self._connection.commit()
 
     def compute_hash(self, file_path: str) -> str:
-        """Compute and return SHA-256 hash of a file."""
+        """Return SHA-256 hash of a file, reading the file only if its metadata changed since last time."""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        row = self._connection.execute(
+            "SELECT hash FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+            (path, stat.st_size, stat.st_mtime_ns, stat.st_ino)).fetchone()
+        if row:
+            return row[0]
+        with tracing.span("compute_content_hash", document=path, size=stat.st_size):
+            file_hash = self.compute_content_hash(path)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, inode, hash) VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, file_hash))
+        return file_hash
+
+    @classmethod
+    def compute_content_hash(cls, file_path: str) -> str:
+        """Compute and return SHA-256 hash of a file content."""
         hash_sha256 = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(cls.HASH_READ_BUFFER_SIZE), b""):
                 hash_sha256.update(chunk)
         return hash_sha256.hexdigest()
 
-    def update_hash_map(self, file_path: str, doc_data: BaseModel):
-        """Update the hash map with the new hash and document data in JSON format."""
-        file_hash = self.compute_hash(file_path)
-        self.hash_map[file_hash] = doc_data.model_dump_json()
-        self._save_hash_map()
-
-    def _save_hash_map(self):
-        parent_directory = os.path.dirname(self.map_file)
-        os.makedirs(parent_directory, exist_ok=True)
-        with open(self.map_file, "w") as file:
-            json.dump(self.hash_map, file, indent=4)
+    def update_hash_map(self, file_path: str, doc_data: BaseModel, file_hash: Optional[str] = None):
+        """Store the document data in JSON format under the hash of the file."""
+        if file_hash is None:
+            file_hash = self.compute_hash(file_path)
+        with tracing.span("update_hash_map", document=file_path), self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO documents (hash, data) VALUES (?, ?)",
+                (file_hash, doc_data.model_dump_json()))
 
     def clear_cache(self):
-        self.hash_map = {}
-        self._save_hash_map()
+        with self._connection:
+            self._connection.execute("DELETE FROM documents")
+            self._connection.execute("DELETE FROM file_hashes")
+            self._connection.execute("DELETE FROM pdf_info")
+            self._connection.execute("DELETE FROM routes")
+
+    def close(self):
+        self._connection.close()
 
     def get_document_by_hash(self,
                              file_hash: str,
                              cls: type[BaseModel]
                              ) -> Optional[BaseModel]:
         """Retrieve document data by hash if available."""
-        dumped_model = self.hash_map.get(file_hash)
+        dumped_model = self.get_document_json_by_hash(file_hash)
         if dumped_model:
-            return cls(**json.loads(dumped_model))
+            return cls.model_validate_json(dumped_model)
         return None
 
+    def get_document_json_by_hash(self, file_hash: str) -> Optional[str]:
+        """Retrieve the document data as stored, in JSON format, by hash if available."""
+        row = self._connection.execute(
+            "SELECT data FROM documents WHERE hash = ?", (file_hash,)).fetchone()
+        return row[0] if row else None
+
+
+    def get_pdf_info(self, pdf_file: str) -> PdfInfo:
+        """
+        Page count and information of a PDF, read from the PDF only the first time its content is seen.
+        Example:
+        >>> result_cache.get_pdf_info('data/frais/sncf/trips/trip1.pdf').page_count
+        2
+        """
+        file_hash = self.compute_hash(pdf_file)
+        row = self._connection.execute("SELECT data FROM pdf_info WHERE hash = ?", (file_hash,)).fetchone()
+        if row:
+            return PdfInfo.model_validate_json(row[0])
+        with tracing.span("read_pdf_info", document=pdf_file):
+            pdf_info = read_pdf_info(pdf_file)
+        with self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO pdf_info (hash, data) VALUES (?, ?)",
+                                     (file_hash, pdf_info.model_dump_json()))
+        return pdf_info
+
+    def get_route(self, file_path: str, router: str, sniff: Callable[[str], Optional[str]]) -> Optional[str]:
+        """
+        Name of the extractor a document is routed to (None when no extractor recognizes it),
+        sniffed only the first time its content is seen by the router.
+        Example:
+        >>> result_cache.get_route('data/bank/inbox/export.csv', 'BNPStatementExtractor|RevolutStatementExtractor', sniff)
+        'RevolutStatementExtractor'
+
+        :param router: identifies the extractors, and their order, the documents are routed between
+        :param sniff: the name of the extractor of a document, from its path
+        """
+        file_hash = self.compute_hash(file_path)
+        row = self._connection.execute("SELECT extractor FROM routes WHERE hash = ? AND router = ?",
+                                       (file_hash, router)).fetchone()
+        if row:
+            return row[0]
+        with tracing.span("sniff_document", document=file_path):
+            extractor = sniff(file_path)
+        with self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO routes (hash, router, extractor) VALUES (?, ?, ?)",
+                                     (file_hash, router, extractor))
+        return extractor
 
     def get_or_process_document(self,
                                 file_path: str,
@@ -76,13 +198,13 @@ class ResultFileCache:
         """
         file_hash = self.compute_hash(file_path)
         model_cls = callback_process.__annotations__['return']
-        doc_data = self.get_document_by_hash(file_hash, model_cls)
+        with tracing.span("get_document_by_hash", document=file_path):
+            doc_data = self.get_document_by_hash(file_hash, model_cls)
         if doc_data:
             if found_callback:
                 found_callback(doc_data, file_path)
         elif not doc_data:
             print(f"Processing and caching {file_path}")
             doc_data = callback_process(file_path)
-            self.update_hash_map(file_path, doc_data)
+            self.update_hash_map(file_path, doc_data, file_hash)
         return doc_data
-
@@ -0,0 +1,28 @@
+import json
+import os
+from typing import Optional
+
+
+def load_run_manifest(manifest_file: str) -> dict[str, Optional[str]]:
+    """
+    Load the documents that contributed to the outputs of the previous run.
+    Example:
+    >>> load_run_manifest('data/result/bank_run_manifest.json')
+    {'data/bank/bnp/RLV_CHQ_2024.pdf': 'e3b0c44298fc1c149afbf4c8996fb924...'}
+
+    :return: Dictionary mapping each document path to its content hash, empty if there was no previous run.
+        The hash is None for a document added to the outputs unfinished (e.g. transactions left without category),
+        seen as changed by the next run.
+    """
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, 'r') as f:
+        return json.load(f)
+
+
+def save_run_manifest(manifest_file: str, manifest: dict[str, Optional[str]]):
+    parent_directory = os.path.dirname(manifest_file)
+    os.makedirs(parent_directory, exist_ok=True)
+    with open(manifest_file + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(manifest_file + '.tmp', manifest_file)
@@ -0,0 +1,106 @@
+"""
+Span timers for the --profile flag of the calculators.
+Spans are recorded as Chrome trace "complete" events (open the JSON in chrome://tracing or https://ui.perfetto.dev).
+When tracing is not enabled, span() returns a shared no-op context manager: nothing is timed nor recorded.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Iterator, Optional, TypeVar
+
+T = TypeVar('T')
+
+_enabled = False
+_events: list[dict] = []
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, document: Optional[str] = None, **args):
+    """
+    Time the enclosed block as a span of the trace.
+    Example:
+    >>> with tracing.span("extract_statement", document=pdf_path):
+    ...     bank_statement = extractor.extract_statement(pdf_path)
+
+    :param document: path of the processed document, spans are also reported per document
+    :param args: extra values shown with the span in the trace viewer
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _record_span(name, document, args)
+
+
+@contextlib.contextmanager
+def _record_span(name: str, document: Optional[str], args: dict) -> Iterator[None]:
+    if document is not None:
+        args["document"] = document
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        _events.append({"name": name, "ph": "X", "ts": start / 1000, "dur": (end - start) / 1000,
+                        "pid": os.getpid(), "tid": threading.get_ident(), "args": args})
+
+
+def run_collecting_events(function: Callable[..., T], *args) -> tuple[T, list[dict]]:
+    """
+    Run function with tracing enabled and return its result with the events it recorded.
+    Meant to be submitted to worker processes, the events are then added to the main process trace with add_events.
+    """
+    global _events
+    enable()
+    # a forked worker inherits the events of the main process
+    _events = []
+    result = function(*args)
+    return result, _events
+
+
+def add_events(events: list[dict]):
+    _events.extend(events)
+
+
+def write_chrome_trace(trace_file: str):
+    os.makedirs(os.path.dirname(trace_file), exist_ok=True)
+    with open(trace_file, "w") as f:
+        json.dump({"traceEvents": _events, "displayTimeUnit": "ms"}, f)
+    print(f"Chrome trace written to: {os.path.abspath(trace_file)}")
+
+
+def print_report(slowest_documents: int = 10):
+    """Print the total time of each stage, then the stage times of the slowest documents."""
+    stage_durations = defaultdict(list)
+    document_stage_durations = defaultdict(lambda: defaultdict(float))
+    for event in _events:
+        stage_durations[event["name"]].append(event["dur"])
+        document = event["args"].get("document")
+        if document is not None:
+            document_stage_durations[document][event["name"]] += event["dur"]
+
+    print(f"{'stage':45} {'calls':>7} {'total ms':>11} {'mean ms':>10} {'max ms':>10}")
+    for name, durations in sorted(stage_durations.items(), key=lambda item: -sum(item[1])):
+        print(f"{name:45} {len(durations):7} {sum(durations) / 1000:11.1f} "
+              f"{sum(durations) / len(durations) / 1000:10.2f} {max(durations) / 1000:10.2f}")
+
+    if not document_stage_durations:
+        return
+    # nested spans of a document are included in the outermost one, which is the longest
+    document_durations = {document: max(durations.values())
+                          for document, durations in document_stage_durations.items()}
+    print(f"\nSlowest documents ({min(slowest_documents, len(document_durations))} of {len(document_durations)}):")
+    for document in sorted(document_durations, key=document_durations.get, reverse=True)[:slowest_documents]:
+        stages = ", ".join(f"{name} {duration / 1000:.1f}"
+                           for name, duration in document_stage_durations[document].items())
+        print(f"{document_durations[document] / 1000:10.1f} ms  {document}\n{'':14}{stages}")
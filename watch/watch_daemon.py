@@ -0,0 +1,74 @@
+import argparse
+import time
+import traceback
+
+from bank import bank_calculator
+from bank.generic.transaction_categorizer import TransactionCategorizer
+from const.const_gl import ConstGl, setup_dirs
+from frais import frais_calculator
+from util.folder_watcher import FolderWatcher
+from util.result_file_cache import ResultFileCache
+
+
+def refresh(name: str, refresh_function):
+    """Run a refresh, an error (e.g. a malformed statement) is reported without stopping the daemon."""
+    print(f"Refreshing {name} outputs")
+    start = time.perf_counter()
+    try:
+        output_file = refresh_function()
+        print(f"{name} outputs refreshed in {time.perf_counter() - start:.1f}s: {output_file}")
+    except Exception:
+        traceback.print_exc()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(
+        description="Watch the bank statements and SNCF trips folders and refresh the outputs as files land")
+    parser.add_argument("--interval", type=float, default=2, help="seconds between two folder polls")
+    parser.add_argument("--debounce", type=float, default=5,
+                        help="seconds without file change before refreshing, a burst of downloads causes one refresh")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of processes used to extract statements and trip proofs missing from the cache")
+    parser.add_argument("--frais-start-date", default='01/10/2023',
+                        help="start date (day/month/year) of the frais report")
+    parser.add_argument("--no-frais", action="store_true", help="do not watch the SNCF trips folder")
+    args = parser.parse_args(argv)
+
+    setup_dirs()
+    # kept warm between refreshes
+    result_hasher = ResultFileCache()
+    transaction_categorizer = TransactionCategorizer()
+    banks_path_tuples = bank_calculator.get_banks_path_tuples(result_cache=result_hasher)
+
+    def refresh_bank() -> str:
+        # nobody answers the category questions of a daemon, transactions without a rule are only reported
+        return bank_calculator.update_outputs(banks_path_tuples, result_hasher, transaction_categorizer,
+                                              jobs=args.jobs, interactive=False)
+
+    def refresh_frais() -> str:
+        return frais_calculator.build_frais_report(args.frais_start_date, result_hasher, args.jobs)
+
+    watched = [(FolderWatcher([bank_path for bank_path, _ in banks_path_tuples], args.debounce),
+                "bank", refresh_bank)]
+    if not args.no_frais:
+        frais_calculator.set_frais_locale()
+        watched.append((FolderWatcher([ConstGl.PATH_TO_DATA_FRAIS_SNCF_TRIPS], args.debounce),
+                        "frais", refresh_frais))
+
+    for _, name, refresh_function in watched:
+        refresh(name, refresh_function)
+    print("Watching for new files, Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(args.interval)
+            for watcher, name, refresh_function in watched:
+                if watcher.poll():
+                    refresh(name, refresh_function)
+    except KeyboardInterrupt:
+        print("Stopped")
+    finally:
+        result_hasher.close()
+
+
+if __name__ == '__main__':
+    main()